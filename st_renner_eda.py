@@ -1,6 +1,25 @@
 import streamlit as st
 from st_renner_libs import *
 
+# Tabelas e colunas usadas pelos gráficos desta página
+REQUISITOS_DADOS = {
+    'clientes': ['idade', 'genero', 'cidade', 'data_ultima_compra_renner', 'data_primeira_compra_renner'],
+    'navegacao': ['nome_evento'],
+    'transacao': ['codigo_item', 'valor', 'tipo_venda', 'nome_divisao'],
+}
+
+# Agregados pré-calculados dos gráficos desta página (ver gerar_agregados_graficos)
+AGREGADOS_DADOS = [
+    'contagem_capitais', 'contagem_genero', 'cidades_35_percent', 'percentual_acumulado_35',
+    'contagem_eventos', 'contagem_tipo_venda', 'vendas_item', 'variacao_itens',
+]
+
+# Tabelas e colunas ainda lidas quando os agregados estão disponíveis
+REQUISITOS_DADOS_AGREGADOS = {
+    'clientes': ['idade', 'data_ultima_compra_renner', 'data_primeira_compra_renner'],
+    'transacao': ['codigo_item', 'valor', 'nome_divisao'],
+}
+
 
 def main():
     # Page title
@@ -16,30 +35,41 @@ def main():
     '''
     st.markdown(texto_analise_exp)
 
-    # Load and prepare data
-    df_clientes, df_navegacao, df_transacao = read_csv_files_eda()
-    df_clientes = converte_data_clientes(df_clientes)
-    df_clientes = aplicar_limpeza_cidades(df_clientes)
+    # Load and prepare data (agregados pré-calculados e snapshot local já tratado, quando atualizados);
+    # a pasta input é listada uma única vez para os três loaders
+    listagem = listar_entradas('input/')
+    agregados = read_agregados_graficos(AGREGADOS_DADOS, listagem)
+    requisitos = REQUISITOS_DADOS if agregados is None else REQUISITOS_DADOS_AGREGADOS
+
+    # Os dataframes do snapshot são somente leitura; os gráficos abaixo apenas filtram e criam colunas
+    dfs_snapshot = read_snapshot_arrow(requisitos, listagem)
+    if dfs_snapshot is not None:
+        df_clientes, df_navegacao, df_transacao = dfs_snapshot
+    else:
+        df_clientes, df_navegacao, df_transacao = read_csv_files_eda(requisitos, listagem=listagem)
+        df_clientes = converte_data_clientes(df_clientes)
+        if agregados is None:
+            df_clientes = aplicar_limpeza_cidades(df_clientes)
+
+    if agregados is None:
+        agregados = calcular_agregados_eda(df_clientes, df_navegacao, df_transacao)
     
     # Create all figures first
-    fig1 = grafico_capitais_interior(df_clientes)
+    fig1 = grafico_capitais_interior(agregados['contagem_capitais'])
     fig2 = criar_grafico_distribuicao_idade(df_clientes)
     fig3, _ = criar_grafico_distribuicao_idades_negativas(df_clientes)
     df_clientes = df_clientes.loc[df_clientes['idade']>=16]
-    fig4 = criar_grafico_distribuicao_genero(df_clientes)
+    fig4 = criar_grafico_distribuicao_genero(agregados['contagem_genero'])
     fig5 = criar_grafico_distribuicao_compras(df_clientes)
     fig6 = criar_grafico_intervalo_compras(df_clientes)
-    cidades_35_percent_data, percentual_acumulado_35 = transformacoes_grafico_cidades(df_clientes)
-    fig7 = criar_grafico_cidades_35_percent(cidades_35_percent_data, percentual_acumulado_35)
-    fig8 = criar_grafico_eventos_jornada(df_navegacao)
-    fig9 = criar_grafico_tipo_venda(df_transacao)
+    fig7 = criar_grafico_cidades_35_percent(agregados['cidades_35_percent'], agregados['percentual_acumulado_35'])
+    fig8 = criar_grafico_eventos_jornada(agregados['contagem_eventos'])
+    fig9 = criar_grafico_tipo_venda(agregados['contagem_tipo_venda'])
     fig10 = criar_grafico_boxplot_divisao(df_transacao)
     fig11 = plot_sales_value_distribution(df_transacao)
-    df_vendas_item = transformacao_grafico_vendas_item(df_transacao)
-    fig12 = plot_top_items_sales(df_vendas_item, top_n=10)
+    fig12 = plot_top_items_sales(agregados['vendas_item'], top_n=10)
     fig13 = plot_item_boxplot(df_transacao, 108799)
-    df_variacao = transformacoes_grafico_variacao(df_transacao)
-    fig14 = plot_cv_distribution(df_variacao)
+    fig14 = plot_cv_distribution(agregados['variacao_itens'])
 
     # Block 1: Distribution of capitals vs interior and age distribution
     col1, col2 = st.columns(2)
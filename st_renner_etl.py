@@ -1,6 +1,26 @@
 import streamlit as st
 from st_renner_libs import *
 
+# Tabelas e colunas usadas pelos gráficos desta página
+REQUISITOS_DADOS = {
+    'clientes': ['idade', 'data_ultima_compra_renner', 'data_primeira_compra_renner'],
+    'transacao': ['codigo_item', 'valor'],
+}
+
+# Condições aplicadas já na leitura; o item 108799 é descartado pelas heurísticas do ETL
+FILTROS_DADOS = {
+    'transacao': [('codigo_item', '!=', 108799)],
+}
+
+# Agregados pré-calculados dos gráficos desta página (ver gerar_agregados_graficos)
+AGREGADOS_DADOS = ['variacao_itens_etl']
+
+# Tabelas e colunas ainda lidas quando os agregados estão disponíveis
+REQUISITOS_DADOS_AGREGADOS = {
+    'clientes': ['idade', 'data_ultima_compra_renner', 'data_primeira_compra_renner'],
+}
+
+
 def main():
     st.markdown("<h1 style='color: #FF0000;'>Renner ReThink.</h1>", unsafe_allow_html=True)
     st.markdown("<h3 style='color: #FF0000;'>ETL</h3>", unsafe_allow_html=True)
@@ -11,15 +31,22 @@ def main():
         bem como suas justificativas e impactos nas análises.
     ''')
 
-    # Load and prepare data
-    df_clientes, _, df_transacao = read_csv_files_eda()
+    # Load and prepare data (agregados pré-calculados, quando atualizados); a pasta input é listada uma única vez
+    listagem = listar_entradas('input/')
+    agregados = read_agregados_graficos(AGREGADOS_DADOS, listagem)
+    requisitos = REQUISITOS_DADOS if agregados is None else REQUISITOS_DADOS_AGREGADOS
+
+    df_clientes, _, df_transacao = read_csv_files_eda(requisitos, FILTROS_DADOS, listagem=listagem)
     df_clientes = converte_data_clientes(df_clientes)
 
     # Create all figures first
     fig1 = plot_age_distribution_etl(df_clientes)
     fig2 = plot_age_distribution_over_16(df_clientes)
     fig3 = plot_purchase_interval(df_clientes)
-    df_variacao = transformacoes_etl_heuristicas(df_transacao)
+    if agregados is not None:
+        df_variacao = agregados['variacao_itens_etl']
+    else:
+        df_variacao = transformacoes_etl_heuristicas(df_transacao)
     fig4, df_variacao_m1 = plot_variation_coefficient(df_variacao)
     fig5, _ = plot_filtered_variation_coefficient(df_variacao_m1)
     fig6 = plot_filtered_variation_coefficient_restrictive(df_variacao_m1)
@@ -1,14 +1,24 @@
 import streamlit as st
 from st_renner_libs import *
 
+# Tabelas e colunas usadas pelos gráficos desta página
+REQUISITOS_DADOS = {
+    'transacao': ['id_cliente', 'codigo_item', 'valor', 'tipo_venda', 'nome_divisao', 'data_venda'],
+    'itens_metricas': None,
+}
+
+# Período das transações analisadas (datas inicial e final); None usa todo o histórico
+PERIODO_DADOS = None
+
+
 def main():
     # Cria o título da página
     st.markdown('<h1 style="color: #FF0000;">Renner ReThink.</h1>', unsafe_allow_html=True)
     st.markdown("<h3 style='color: #FF0000;'>Feature Engineering</h3>", unsafe_allow_html=True)
     st.markdown("<h4 style='color: #FF0000;'>Criação de atributos e registros</h4>", unsafe_allow_html=True)
 
-    _, df_transacao = read_csv_files_fe()
-    _, df_itens_metricas = read_parquet_files_fe()
+    _, df_transacao = read_csv_files_fe(REQUISITOS_DADOS, periodo=PERIODO_DADOS)
+    _, df_itens_metricas = read_parquet_files_fe(REQUISITOS_DADOS)
     df_cliente_transacao = df_transacao.merge(df_itens_metricas)
     df_cliente_transacao = transform_sales_dates_fe(df_cliente_transacao)
     fig1 = plot_weekday_sales_fe(df_cliente_transacao)
@@ -0,0 +1,36 @@
+"""
+Rotinas offline de preparação dos dados do bucket, executadas fora do Streamlit.
+
+Uso: python st_renner_jobs.py <rotina>
+"""
+import argparse
+from st_renner_libs import *
+
+def gerar_manifestos():
+    """
+    Regrava o manifesto de todas as pastas de dados do bucket.
+    """
+    for prefixo in TABELAS_PASTAS:
+        gerar_manifesto(prefixo)
+
+
+# Rotinas disponíveis na linha de comando
+ROTINAS = {
+    'compactar': compactar_entradas_parquet,
+    'manifesto': gerar_manifestos,
+    'snapshot': gerar_snapshot_arrow,
+    'agregados': gerar_agregados_graficos,
+    'itens': atualizar_metricas_itens,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rotinas de preparação dos dados do Renner ReThink')
+    parser.add_argument('rotina', choices=ROTINAS.keys(), help='Rotina a ser executada')
+    args = parser.parse_args()
+
+    ROTINAS[args.rotina]()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,179 +2,1928 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import boto3
+import difflib
+from botocore.config import Config
+from botocore.exceptions import ClientError
+import gzip
 import io
+import json
 import os
+import hashlib
+import mmap
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, ExitStack
+from functools import lru_cache
 import unidecode
+import zstandard
 import re
 import plotly.graph_objects as go
+from pandas.api.types import union_categoricals
+import pyarrow as pa
+import pyarrow.feather as feather
 from scipy import stats
 from scipy.stats import gaussian_kde
 from scipy.signal import savgol_filter
 from datetime import datetime
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from dotenv import load_dotenv
 load_dotenv()
 
+# Copy-on-write: os dataframes do cache compartilhado são devolvidos como cópias rasas, e
+# qualquer alteração de uma sessão copia apenas as colunas alteradas, sem afetar o cache
+pd.set_option('mode.copy_on_write', True)
+
+# Pool de conexões do cliente S3; deve comportar os downloads paralelos
+# (MAX_DOWNLOADS_PARALELOS x RANGED_CONCORRENCIA) de todas as sessões
+S3_MAX_CONEXOES = int(os.getenv('RENNER_S3_MAX_CONEXOES', 64))
+S3_MAX_TENTATIVAS = int(os.getenv('RENNER_S3_MAX_TENTATIVAS', 10))
+
+# Configuração comum a todos os clientes S3 (AWS e servidores compatíveis)
+S3_CONFIG = Config(
+    max_pool_connections=S3_MAX_CONEXOES,
+    retries={'max_attempts': S3_MAX_TENTATIVAS, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
+
+
 # Criar função para ler arquivos parquet
+@st.cache_resource(show_spinner=False)
 def get_s3_client() -> boto3.client:
     """
-    Cria e retorna um cliente S3 usando as credenciais configuradas.
+    Cria e retorna um cliente S3 usando as credenciais configuradas.
+
+    O cliente é criado uma única vez por processo e compartilhado entre as sessões e
+    as threads de download (clientes do boto3 são thread-safe), reaproveitando a
+    resolução de credenciais e o pool de conexões keep-alive.
+
+    :return s3_client: Retorna o cliente S3 criado
+    """
+    try:
+        aws_access_key = st.secrets.get("AWS_ACCESS_KEY_ID")
+        aws_secret_key = st.secrets.get("AWS_SECRET_ACCESS_KEY")
+
+        if not aws_access_key or not aws_secret_key:
+            aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
+            aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+
+        s3_client = boto3.client(
+            's3',
+            aws_access_key_id=aws_access_key,
+            aws_secret_access_key=aws_secret_key,
+            region_name='us-east-1',
+            config=S3_CONFIG
+        )
+
+        return s3_client
+
+    except Exception as e:
+        print(f"Erro ao criar cliente S3: {str(e)}")
+        raise
+
+
+# Configurações do bucket
+BUCKET_NAME = 'bkt-dev-projcdia-rennerrethink-streamlit'
+
+# Onde os dados ficam guardados: 's3' (bucket da AWS), 'local' (cópia em um diretório)
+# ou 's3_compativel' (servidor com API do S3, como MinIO ou moto, em RENNER_S3_ENDPOINT_URL)
+ARMAZENAMENTO_TIPO = os.getenv('RENNER_ARMAZENAMENTO', 's3')
+ARMAZENAMENTO_DIR = os.getenv('RENNER_ARMAZENAMENTO_DIR', 'dados')
+S3_ENDPOINT_URL = os.getenv('RENNER_S3_ENDPOINT_URL')
+
+
+class ArmazenamentoDados(ABC):
+    """
+    Interface de acesso aos objetos do dataset, independente de onde eles estão guardados.
+
+    As chaves seguem o formato do S3 ('input/transacao.csv') e os objetos listados são
+    dicionários com Key, ETag, Size e LastModified, como na listagem do boto3.
+    Objetos inexistentes geram FileNotFoundError em todas as implementações.
+    """
+    nome = 'armazenamento'
+
+    @abstractmethod
+    def listar(self, prefixo: str) -> list[dict]:
+        """
+        Lista todos os objetos cujas chaves começam com o prefixo.
+        """
+
+    @abstractmethod
+    def abrir(self, chave: str, etag: str | None = None, intervalo: tuple[int, int] | None = None):
+        """
+        Abre um objeto para leitura sequencial (objeto com read e close).
+
+        :param chave: Chave do objeto
+        :param etag: Se informado, a leitura falha caso o objeto tenha sido alterado
+        :param intervalo: Bytes [início, fim) a serem lidos; None lê o objeto inteiro
+        """
+
+    @abstractmethod
+    def gravar(self, chave: str, conteudo) -> None:
+        """
+        Grava um objeto a partir de bytes ou de um objeto file-like.
+        """
+
+    @abstractmethod
+    def remover(self, chave: str) -> None:
+        """
+        Remove um objeto.
+        """
+
+    def caminho_local(self, chave: str) -> str | None:
+        """
+        Caminho do objeto no sistema de arquivos, quando ele pode ser lido diretamente
+        sem download nem cache; None nas implementações remotas.
+        """
+        return None
+
+
+class ArmazenamentoS3(ArmazenamentoDados):
+    """
+    Objetos guardados em um bucket do S3, acessados pelo cliente compartilhado de get_s3_client.
+    """
+    def __init__(self, bucket_name: str = BUCKET_NAME):
+        self.bucket_name = bucket_name
+        self.nome = f's3://{bucket_name}'
+
+    def cliente(self):
+        return get_s3_client()
+
+    def listar(self, prefixo: str) -> list[dict]:
+        paginator = self.cliente().get_paginator('list_objects_v2')
+
+        objetos = []
+        for pagina in paginator.paginate(Bucket=self.bucket_name, Prefix=prefixo):
+            objetos.extend(pagina.get('Contents', []))
+
+        return objetos
+
+    def abrir(self, chave: str, etag: str | None = None, intervalo: tuple[int, int] | None = None):
+        parametros = {'Bucket': self.bucket_name, 'Key': chave}
+        if etag is not None:
+            parametros['IfMatch'] = etag
+        if intervalo is not None:
+            parametros['Range'] = f'bytes={intervalo[0]}-{intervalo[1] - 1}'
+
+        try:
+            return self.cliente().get_object(**parametros)['Body']
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                raise FileNotFoundError(f'{self.nome}/{chave}') from e
+            raise
+
+    def gravar(self, chave: str, conteudo) -> None:
+        if isinstance(conteudo, (bytes, bytearray)):
+            conteudo = io.BytesIO(conteudo)
+        self.cliente().upload_fileobj(conteudo, self.bucket_name, chave)
+
+    def remover(self, chave: str) -> None:
+        self.cliente().delete_object(Bucket=self.bucket_name, Key=chave)
+
+
+class ArmazenamentoS3Compativel(ArmazenamentoS3):
+    """
+    Objetos guardados em um servidor com a API do S3 (MinIO, moto em modo servidor etc.),
+    útil para rodar a aplicação e os testes de desempenho sem acesso à AWS.
+    """
+    def __init__(self, endpoint_url: str, bucket_name: str = BUCKET_NAME):
+        super().__init__(bucket_name)
+        self.endpoint_url = endpoint_url
+        self.nome = f'{endpoint_url.rstrip("/")}/{bucket_name}'
+        self._cliente = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+            region_name='us-east-1',
+            config=S3_CONFIG
+        )
+
+    def cliente(self):
+        return self._cliente
+
+
+class ArmazenamentoLocal(ArmazenamentoDados):
+    """
+    Objetos guardados em um diretório local com a mesma estrutura de pastas do bucket
+    (por exemplo, um espelho do bucket em um nó de borda).
+
+    O ETag de cada arquivo é derivado da data de modificação e do tamanho, o que basta
+    para invalidar os caches quando o arquivo é substituído.
+    """
+    def __init__(self, raiz: str = ARMAZENAMENTO_DIR):
+        self.raiz = os.path.abspath(raiz)
+        self.nome = f'file://{self.raiz}'
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.raiz, *chave.split('/'))
+
+    @staticmethod
+    def _etag(info: os.stat_result) -> str:
+        return f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+
+    def listar(self, prefixo: str) -> list[dict]:
+        objetos = []
+        for pasta, _, arquivos in os.walk(self.raiz):
+            for arquivo in arquivos:
+                caminho = os.path.join(pasta, arquivo)
+                chave = os.path.relpath(caminho, self.raiz).replace(os.sep, '/')
+                if not chave.startswith(prefixo) or arquivo.endswith('.tmp'):
+                    continue
+
+                info = os.stat(caminho)
+                objetos.append({
+                    'Key': chave,
+                    'ETag': self._etag(info),
+                    'Size': info.st_size,
+                    'LastModified': datetime.fromtimestamp(info.st_mtime).astimezone(),
+                })
+
+        return sorted(objetos, key=lambda obj: obj['Key'])
+
+    def abrir(self, chave: str, etag: str | None = None, intervalo: tuple[int, int] | None = None):
+        arquivo = open(self._caminho(chave), 'rb')
+
+        if etag is not None and self._etag(os.fstat(arquivo.fileno())) != etag:
+            arquivo.close()
+            raise IOError(f'{chave} foi alterado depois da listagem')
+
+        if intervalo is None:
+            return arquivo
+
+        with arquivo:
+            arquivo.seek(intervalo[0])
+            return io.BytesIO(arquivo.read(intervalo[1] - intervalo[0]))
+
+    def gravar(self, chave: str, conteudo) -> None:
+        caminho = self._caminho(chave)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        caminho_tmp = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+        with open(caminho_tmp, 'wb') as arquivo:
+            if isinstance(conteudo, (bytes, bytearray)):
+                arquivo.write(conteudo)
+            else:
+                shutil.copyfileobj(conteudo, arquivo, 8 * 1024 ** 2)
+        os.replace(caminho_tmp, caminho)
+
+    def remover(self, chave: str) -> None:
+        os.remove(self._caminho(chave))
+
+    def caminho_local(self, chave: str) -> str | None:
+        return self._caminho(chave)
+
+
+@st.cache_resource(show_spinner=False)
+def get_armazenamento() -> ArmazenamentoDados:
+    """
+    Cria e retorna o armazenamento configurado em RENNER_ARMAZENAMENTO, compartilhado
+    por todo o processo.
+
+    :return armazenamento: Implementação de ArmazenamentoDados usada pelos loaders
+    """
+    if ARMAZENAMENTO_TIPO == 'local':
+        return ArmazenamentoLocal(ARMAZENAMENTO_DIR)
+
+    if ARMAZENAMENTO_TIPO == 's3_compativel':
+        if not S3_ENDPOINT_URL:
+            raise ValueError("RENNER_S3_ENDPOINT_URL deve ser informado para o armazenamento s3_compativel")
+        return ArmazenamentoS3Compativel(S3_ENDPOINT_URL)
+
+    if ARMAZENAMENTO_TIPO != 's3':
+        raise ValueError(f"Armazenamento desconhecido: {ARMAZENAMENTO_TIPO}")
+
+    return ArmazenamentoS3()
+
+
+# Esquema das tabelas de entrada: tipos explícitos, evitando a inferência do pandas,
+# e colunas de data, convertidas uma única vez na leitura
+FORMATO_DATAS = 'ISO8601'
+ESQUEMAS_TABELAS = {
+    'clientes': {
+        'versao': 1,
+        'tipos': {'id_cliente': 'int64', 'genero': 'category', 'cidade': 'category'},
+        'datas': ['data_ultima_compra_renner', 'data_primeira_compra_renner'],
+    },
+    'navegacao': {
+        'versao': 1,
+        'tipos': {'id_cliente': 'int64', 'nome_evento': 'category'},
+        'datas': ['data_evento'],
+    },
+    'transacao': {
+        'versao': 1,
+        'tipos': {
+            'id_cliente': 'int64',
+            'codigo_item': 'int64',
+            'valor': 'float64',
+            'tipo_venda': 'category',
+            'nome_divisao': 'category',
+        },
+        'datas': ['data_venda'],
+    },
+}
+
+
+def _aplicar_esquema(df: pd.DataFrame, tabela: str) -> pd.DataFrame:
+    """
+    Garante que as colunas de um dataframe sigam o esquema registrado da tabela.
+
+    Usada nos arquivos parquet, que podem ter sido gravados com outros tipos; no CSV
+    o esquema já é aplicado pelo próprio parser.
+
+    :param df: Dataframe lido do bucket
+    :param tabela: Nome da tabela em ESQUEMAS_TABELAS
+    :return df: Dataframe com os tipos do esquema
+    """
+    esquema = ESQUEMAS_TABELAS.get(tabela)
+    if esquema is None:
+        return df
+
+    tipos = {coluna: tipo for coluna, tipo in esquema['tipos'].items()
+             if coluna in df.columns and str(df[coluna].dtype) != tipo}
+    if tipos:
+        df = df.astype(tipos)
+
+    for coluna in esquema['datas']:
+        if coluna in df.columns and not pd.api.types.is_datetime64_any_dtype(df[coluna]):
+            df[coluna] = pd.to_datetime(df[coluna], format=FORMATO_DATAS)
+
+    return df
+
+
+# Arquivo, em cada pasta do bucket, com a lista dos objetos atuais do dataset
+MANIFESTO_NOME = '_manifest.json'
+
+# Arquivo, em cada pasta do bucket, com os shards CSV já ingeridos nos parquets compactados
+CHECKPOINT_NOME = '_checkpoint.json'
+
+# Pasta dos agregados pré-calculados dos gráficos, que não fazem parte das tabelas do dataset
+AGREGADOS_PREFIXO = 'output/agregados/'
+AGREGADOS_INDICE = f'{AGREGADOS_PREFIXO}_indice.json'
+
+# Pasta do estado incremental das estatísticas de preço dos itens (ver atualizar_metricas_itens)
+# e chave padrão da tabela de métricas dos itens derivada dele
+ESTADO_ITENS_PREFIXO = 'output/estado_itens/'
+ESTADO_ITENS_INDICE = f'{ESTADO_ITENS_PREFIXO}_indice.json'
+ITENS_METRICAS_KEY = 'output/itens_metricas.parquet'
+
+# Tabelas de cada pasta do bucket: {nome da tabela: trecho do nome do arquivo}, em ordem de prioridade
+TABELAS_PASTAS = {
+    'input/': {'clientes': 'cliente', 'navegacao': 'navegacao', 'transacao': 'transacao'},
+    'output/': {'clientes': 'cliente', 'itens_metricas': 'itens'},
+}
+
+# Pasta das cópias parquet dos CSVs gravadas por compactar_entradas_parquet; o job só grava
+# e remove objetos dentro dela, nunca os arquivos enviados para a pasta input
+COMPACTADOS_PREFIXO = 'input/_compactados/'
+
+# Tabelas compactadas em partições mensais (input/_compactados/<tabela>/ano=AAAA/mes=MM/<tabela>.parquet)
+# e a coluna de data que define a partição
+PARTICOES_TABELAS = {
+    'transacao': 'data_venda',
+}
+PADRAO_PARTICAO = re.compile(r'/ano=(\d{4})/mes=(\d{2})/')
+
+# Parâmetros dos parquets gerados a partir dos CSVs de entrada
+ORDENACAO_PARQUET = {
+    'clientes': ['id_cliente'],
+    'navegacao': ['id_cliente', 'data_evento'],
+    'transacao': ['id_cliente', 'codigo_item'],
+}
+PARQUET_LINHAS_ROW_GROUP = 1_000_000
+PARQUET_NIVEL_ZSTD = 6
+
+
+# Cache local dos objetos do bucket (tamanho máximo em bytes; 0 desativa o cache em disco)
+CACHE_DIR = os.getenv('RENNER_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'renner_rethink'))
+CACHE_MAX_BYTES = int(os.getenv('RENNER_CACHE_MAX_BYTES', 4 * 1024 ** 3))
+
+# Número máximo de objetos baixados e lidos ao mesmo tempo
+MAX_DOWNLOADS_PARALELOS = int(os.getenv('RENNER_MAX_DOWNLOADS_PARALELOS', 4))
+
+# Download em partes (requisições Range paralelas) para objetos grandes
+RANGED_MIN_BYTES = int(os.getenv('RENNER_RANGED_MIN_BYTES', 64 * 1024 ** 2))
+RANGED_PART_BYTES = int(os.getenv('RENNER_RANGED_PART_BYTES', 16 * 1024 ** 2))
+RANGED_CONCORRENCIA = int(os.getenv('RENNER_RANGED_CONCORRENCIA', 8))
+
+
+def _caminho_cache(file_key: str, etag: str) -> str:
+    """
+    Monta o caminho do arquivo de cache de um objeto a partir do seu ETag.
+
+    :param file_key: Chave do objeto no bucket, usada apenas para preservar a extensão
+    :param etag: ETag do objeto
+    :return caminho: Caminho do arquivo no diretório de cache
+    """
+    digest = hashlib.sha256(etag.strip('"').encode()).hexdigest()
+    extensao = os.path.splitext(file_key)[1]
+
+    return os.path.join(CACHE_DIR, f'{digest}{extensao}')
+
+
+def _aplicar_limite_cache(caminho_protegido: str) -> None:
+    """
+    Remove os arquivos usados há mais tempo até o cache caber em CACHE_MAX_BYTES.
+
+    :param caminho_protegido: Arquivo que acabou de ser gravado e não deve ser removido
+    """
+    arquivos = []
+    for entrada in os.scandir(CACHE_DIR):
+        if entrada.is_file() and not entrada.name.endswith('.tmp'):
+            info = entrada.stat()
+            arquivos.append((info.st_mtime, info.st_size, entrada.path))
+
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+
+    # Remove do menos para o mais recentemente usado
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= CACHE_MAX_BYTES:
+            break
+        if caminho == caminho_protegido:
+            continue
+        try:
+            os.remove(caminho)
+            total -= tamanho
+        except FileNotFoundError:
+            continue
+
+
+def _baixar_por_intervalos(armazenamento: ArmazenamentoDados, file_key: str, etag: str,
+                           tamanho: int, buffer) -> None:
+    """
+    Baixa um objeto em partes de RANGED_PART_BYTES, com até RANGED_CONCORRENCIA
+    requisições Range em paralelo, gravando cada parte diretamente na sua posição
+    de um buffer já alocado com o tamanho do objeto.
+
+    :param armazenamento: Armazenamento de onde o objeto é lido
+    :param file_key: Chave do objeto no bucket
+    :param etag: ETag do objeto; todas as partes precisam vir da mesma versão
+    :param tamanho: Tamanho do objeto em bytes
+    :param buffer: Buffer gravável com pelo menos `tamanho` bytes
+    """
+    def baixar_parte(inicio: int) -> None:
+        fim = min(inicio + RANGED_PART_BYTES, tamanho)
+        corpo = armazenamento.abrir(file_key, etag, (inicio, fim))
+
+        posicao = inicio
+        with closing(corpo):
+            while bloco := corpo.read(1024 ** 2):
+                buffer[posicao:posicao + len(bloco)] = bloco
+                posicao += len(bloco)
+
+        if posicao != fim:
+            raise IOError(f"Parte {inicio}-{fim - 1} de {file_key} incompleta: {posicao - inicio} bytes recebidos")
+
+    with ThreadPoolExecutor(max_workers=RANGED_CONCORRENCIA) as executor:
+        list(executor.map(baixar_parte, range(0, tamanho, RANGED_PART_BYTES)))
+
+
+def _abrir_objeto(armazenamento: ArmazenamentoDados, file_key: str, etag: str, tamanho: int):
+    """
+    Obtém o conteúdo de um objeto do armazenamento, passando pelo cache em disco.
+
+    Objetos que já estão no sistema de arquivos (armazenamento local) são lidos
+    diretamente. Para os demais, se já existe um arquivo no cache com o mesmo ETag,
+    ele é reaproveitado sem nenhum download; caso contrário, o objeto é gravado no
+    cache e o limite de tamanho é aplicado, descartando os arquivos usados há mais
+    tempo. Objetos a partir de RANGED_MIN_BYTES são baixados em partes paralelas.
+
+    Com o cache desativado, um CSV pequeno é devolvido como o próprio stream da
+    resposta, para que o parser o consuma aos poucos sem manter o arquivo bruto
+    inteiro em memória.
+
+    :param armazenamento: Armazenamento de onde o objeto é lido
+    :param file_key: Chave do objeto no bucket
+    :param etag: ETag do objeto informado pela listagem do bucket
+    :param tamanho: Tamanho do objeto em bytes informado pela listagem do bucket
+    :return conteudo: Caminho do arquivo local ou, com o cache desativado, buffer em memória ou stream da resposta
+    """
+    caminho = armazenamento.caminho_local(file_key)
+    if caminho is not None:
+        return caminho
+
+    em_partes = tamanho >= RANGED_MIN_BYTES
+
+    if CACHE_MAX_BYTES <= 0:
+        if not em_partes:
+            corpo = armazenamento.abrir(file_key, etag)
+
+            # O parquet precisa de acesso aleatório; o CSV (comprimido ou não) é lido direto do stream
+            if _formato_objeto(file_key) == ('.parquet', None):
+                with closing(corpo):
+                    return io.BytesIO(corpo.read())
+            return corpo
+
+        conteudo = io.BytesIO(bytes(tamanho))
+        with conteudo.getbuffer() as buffer:
+            _baixar_por_intervalos(armazenamento, file_key, etag, tamanho, buffer)
+        return conteudo
+
+    caminho = _caminho_cache(file_key, etag)
+
+    if os.path.exists(caminho):
+        # Atualiza a data de modificação para marcar o arquivo como usado recentemente
+        os.utime(caminho)
+        return caminho
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    caminho_tmp = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+    try:
+        if em_partes:
+            # Pré-aloca o arquivo e grava as partes diretamente no mapeamento em memória
+            with open(caminho_tmp, 'w+b') as arquivo:
+                arquivo.truncate(tamanho)
+                with mmap.mmap(arquivo.fileno(), tamanho) as buffer:
+                    _baixar_por_intervalos(armazenamento, file_key, etag, tamanho, buffer)
+                    buffer.flush()
+        else:
+            with closing(armazenamento.abrir(file_key, etag)) as corpo, open(caminho_tmp, 'wb') as arquivo:
+                shutil.copyfileobj(corpo, arquivo, 8 * 1024 ** 2)
+        os.replace(caminho_tmp, caminho)
+    finally:
+        if os.path.exists(caminho_tmp):
+            os.remove(caminho_tmp)
+
+    _aplicar_limite_cache(caminho)
+
+    return caminho
+
+
+# Compressões aceitas nos objetos do bucket, pelo sufixo após a extensão (transacao.csv.gz)
+COMPRESSOES = ('.gz', '.zst')
+
+
+def _formato_objeto(file_key: str) -> tuple[str, str | None]:
+    """
+    Identifica o formato e a compressão de um objeto pela sua chave.
+
+    :param file_key: Chave do objeto no bucket
+    :return extensao: Extensão do arquivo descomprimido ('.csv', '.parquet', ...)
+    :return compressao: Sufixo da compressão (um de COMPRESSOES) ou None se o objeto não é comprimido
+    """
+    base, extensao = os.path.splitext(file_key)
+    if extensao not in COMPRESSOES:
+        return extensao, None
+
+    return os.path.splitext(base)[1], extensao
+
+
+def _descomprimir(conteudo, compressao: str):
+    """
+    Abre um fluxo que descomprime o conteúdo à medida que é lido, sem descomprimir
+    o objeto inteiro antes.
+
+    :param conteudo: Caminho do arquivo ou objeto file-like com os bytes comprimidos
+    :param compressao: Sufixo da compressão (um de COMPRESSOES)
+    :return fluxo: Objeto file-like com os bytes descomprimidos
+    """
+    if compressao == '.gz':
+        return gzip.open(conteudo, 'rb')
+
+    if isinstance(conteudo, str):
+        conteudo = open(conteudo, 'rb')
+
+    # Arquivos gerados por compressores paralelos têm vários frames
+    return zstandard.ZstdDecompressor().stream_reader(conteudo, read_across_frames=True, closefd=True)
+
+
+# Operadores aceitos nos filtros de linhas, no formato do pyarrow: (coluna, operador, valor)
+OPERADORES_FILTRO = {
+    '==': lambda serie, valor: serie == valor,
+    '!=': lambda serie, valor: serie != valor,
+    '<': lambda serie, valor: serie < valor,
+    '<=': lambda serie, valor: serie <= valor,
+    '>': lambda serie, valor: serie > valor,
+    '>=': lambda serie, valor: serie >= valor,
+    'in': lambda serie, valor: serie.isin(valor),
+    'not in': lambda serie, valor: ~serie.isin(valor),
+}
+
+
+def _filtrar_linhas(df: pd.DataFrame, filtros: tuple[tuple, ...]) -> pd.DataFrame:
+    """
+    Aplica em memória os mesmos filtros que o parquet aplica na leitura.
+
+    :param df: Dataframe a ser filtrado
+    :param filtros: Condições (coluna, operador, valor), combinadas com E
+    :return df: Dataframe apenas com as linhas que atendem a todas as condições
+    """
+    mascara = np.ones(len(df), dtype=bool)
+    for coluna, operador, valor in filtros:
+        mascara &= OPERADORES_FILTRO[operador](df[coluna], valor).to_numpy(dtype=bool)
+
+    return df.loc[mascara].reset_index(drop=True)
+
+
+def _ler_arquivo(file_key: str, etag: str, tamanho: int,
+                 tabela: str | None = None, colunas: tuple[str, ...] | None = None,
+                 filtros: tuple[tuple, ...] | None = None) -> pd.DataFrame:
+    """
+    Baixa e lê um objeto do armazenamento.
+
+    Os bytes brutos passam pelo cache em disco, de modo que um novo processo não precisa
+    baixar o objeto outra vez. Tabelas registradas em ESQUEMAS_TABELAS são lidas com os
+    tipos e datas do esquema.
+
+    Objetos comprimidos (COMPRESSOES) são descomprimidos em streaming: o CSV é
+    descomprimido à medida que o parser o consome.
+
+    Nos arquivos parquet, os filtros são repassados ao pyarrow, que descarta pelas
+    estatísticas de cada coluna os row groups que não podem ter linhas válidas, sem
+    decodificá-los; no CSV eles são aplicados logo após a leitura.
+
+    :param file_key: Chave do objeto no bucket
+    :param etag: ETag do objeto informado pela listagem do bucket
+    :param tamanho: Tamanho do objeto em bytes informado pela listagem do bucket
+    :param tabela: Nome da tabela, usado para escolher o esquema
+    :param colunas: Colunas a serem lidas; None lê todas
+    :param filtros: Condições (coluna, operador, valor) que as linhas devem atender; None lê todas
+    :return df: Dataframe com o conteúdo do objeto
+    """
+    conteudo = _abrir_objeto(get_armazenamento(), file_key, etag, tamanho)
+    extensao, compressao = _formato_objeto(file_key)
+
+    with ExitStack() as pilha:
+        if hasattr(conteudo, 'close'):
+            pilha.callback(conteudo.close)
+
+        if compressao is not None:
+            conteudo = pilha.enter_context(_descomprimir(conteudo, compressao))
+
+            # O parquet precisa de acesso aleatório e é descomprimido inteiro em memória
+            if extensao == '.parquet':
+                conteudo = io.BytesIO(conteudo.read())
+
+        colunas = list(colunas) if colunas is not None else None
+
+        filtros = [tuple(filtro) for filtro in filtros] if filtros else None
+
+        if extensao == '.parquet':
+            return _aplicar_esquema(pd.read_parquet(conteudo, columns=colunas, filters=filtros), tabela)
+
+        # As colunas dos filtros precisam ser lidas mesmo que a página não as use
+        colunas_leitura = colunas
+        if colunas is not None and filtros:
+            colunas_leitura = colunas + [coluna for coluna, _, _ in filtros if coluna not in colunas]
+
+        esquema = ESQUEMAS_TABELAS.get(tabela, {'tipos': {}, 'datas': []})
+        datas = [coluna for coluna in esquema['datas'] if colunas_leitura is None or coluna in colunas_leitura]
+
+        # O parser consome o arquivo em blocos, sem carregá-lo inteiro antes
+        df = pd.read_csv(
+            conteudo,
+            usecols=colunas_leitura,
+            dtype=esquema['tipos'],
+            parse_dates=datas,
+            date_format=FORMATO_DATAS
+        )
+
+        if filtros:
+            df = _filtrar_linhas(df, filtros)
+            if colunas is not None:
+                df = df[colunas]
+
+        return df
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _ler_objeto(origem: str, file_key: str, etag: str, tamanho: int,
+                tabela: str | None = None, colunas: tuple[str, ...] | None = None,
+                filtros: tuple[tuple, ...] | None = None) -> pd.DataFrame:
+    """
+    Lê um objeto do armazenamento com _ler_arquivo, mantendo uma única cópia em memória por processo.
+
+    O ETag faz parte da chave do cache: enquanto o objeto não muda no bucket, todas
+    as sessões reutilizam o dataframe já carregado; quando ele é substituído, o ETag
+    muda e o arquivo é baixado novamente. As tabelas de entrada das páginas são lidas
+    inteiras por _ler_tabela; este cache fica para os objetos avulsos (agregados,
+    estado dos itens e shards lidos pelas rotinas).
+
+    :param origem: Nome do armazenamento (get_armazenamento().nome), parte da chave do cache
+    :param file_key: Chave do objeto no bucket
+    :param etag: ETag do objeto informado pela listagem do bucket
+    :param tamanho: Tamanho do objeto em bytes informado pela listagem do bucket
+    :param tabela: Nome da tabela, usado para escolher o esquema
+    :param colunas: Colunas a serem lidas; None lê todas
+    :param filtros: Condições (coluna, operador, valor) que as linhas devem atender; None lê todas
+    :return df: Dataframe com o conteúdo do objeto
+    """
+    return _ler_arquivo(file_key, etag, tamanho, tabela, colunas, filtros)
+
+
+def _listar_objetos_paginado(prefixo: str) -> list[dict]:
+    """
+    Lista todos os objetos de uma pasta do bucket, percorrendo todas as páginas da listagem.
+
+    :param prefixo: Pasta do bucket a ser listada
+    :return objetos: Lista de objetos (dicionários com Key, ETag, Size e LastModified)
+    """
+    objetos = get_armazenamento().listar(prefixo)
+
+    return [obj for obj in objetos
+            if obj['Key'].split('/')[-1] not in (MANIFESTO_NOME, CHECKPOINT_NOME)
+            and not obj['Key'].startswith((AGREGADOS_PREFIXO, ESTADO_ITENS_PREFIXO))]
+
+
+def _listar_objetos(prefixo: str) -> list[dict]:
+    """
+    Lista os objetos de uma pasta do bucket a partir do seu manifesto.
+
+    O manifesto (gerado por gerar_manifesto) é lido com um único GET; a listagem
+    completa e paginada do bucket fica apenas como alternativa quando ele não existe
+    ou não pode ser lido.
+
+    :param prefixo: Pasta do bucket a ser listada
+    :return objetos: Lista de objetos (dicionários com Key, ETag, Size e LastModified,
+        mais tabela e versao_esquema quando vêm do manifesto)
+    """
+    try:
+        with closing(get_armazenamento().abrir(f'{prefixo}{MANIFESTO_NOME}')) as corpo:
+            manifesto = json.loads(corpo.read())
+
+        objetos = manifesto['objetos']
+        for obj in objetos:
+            obj['LastModified'] = datetime.fromisoformat(obj['LastModified'])
+
+        return objetos
+
+    except FileNotFoundError:
+        print(f"Manifesto não encontrado em {prefixo}, listando o bucket")
+
+    except Exception as e:
+        print(f"Erro ao ler manifesto de {prefixo}, listando o bucket: {str(e)}")
+
+    return _listar_objetos_paginado(prefixo)
+
+
+def _ler_checkpoint(prefixo: str) -> dict:
+    """
+    Lê o checkpoint de ingestão de uma pasta do bucket, gravado por compactar_entradas_parquet.
+
+    :param prefixo: Pasta do bucket
+    :return checkpoint: Dicionário {tabela: {'ingeridos': {chave: ETag}, 'compactados': {chave: ETag}}};
+        vazio quando o checkpoint não existe ou não pode ser lido
+    """
+    try:
+        with closing(get_armazenamento().abrir(f'{prefixo}{CHECKPOINT_NOME}')) as corpo:
+            return json.loads(corpo.read())['tabelas']
+
+    except FileNotFoundError:
+        return {}
+
+    except Exception as e:
+        print(f"Erro ao ler checkpoint de {prefixo}: {str(e)}")
+        return {}
+
+
+def gerar_manifesto(prefixo: str) -> None:
+    """
+    Grava o manifesto de uma pasta do bucket com a chave, o tamanho, o ETag, a data
+    de modificação, a tabela e a versão do esquema de cada objeto atual.
+
+    Deve ser executado sempre que os arquivos da pasta mudarem, pois os loaders
+    passam a enxergar apenas os objetos listados no manifesto.
+
+    :param prefixo: Pasta do bucket
+    """
+    tabelas = TABELAS_PASTAS.get(prefixo, {})
+
+    objetos = []
+    for obj in _listar_objetos_paginado(prefixo):
+        file_name = obj['Key'].split('/')[-1].lower()
+        tabela = next((nome for nome, trecho in tabelas.items() if trecho in file_name), None)
+        esquema = ESQUEMAS_TABELAS.get(tabela) if prefixo == 'input/' else None
+
+        objetos.append({
+            'Key': obj['Key'],
+            'ETag': obj['ETag'],
+            'Size': obj['Size'],
+            'LastModified': obj['LastModified'].isoformat(),
+            'tabela': tabela,
+            'versao_esquema': esquema['versao'] if esquema else None,
+        })
+
+    manifesto = {'gerado_em': datetime.now().astimezone().isoformat(), 'objetos': objetos}
+
+    get_armazenamento().gravar(f'{prefixo}{MANIFESTO_NOME}', json.dumps(manifesto, indent=2).encode('utf-8'))
+
+    print(f"Manifesto de {prefixo} gravado com {len(objetos)} objetos")
+
+
+def _periodo_particao(file_key: str) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+    """
+    Identifica o mês coberto por um arquivo de partição a partir da sua chave.
+
+    :param file_key: Chave do objeto no bucket
+    :return periodo: Início (inclusivo) e fim (exclusivo) do mês, ou None se o objeto não é uma partição
+    """
+    correspondencia = PADRAO_PARTICAO.search(file_key)
+    if correspondencia is None:
+        return None
+
+    inicio = pd.Timestamp(year=int(correspondencia[1]), month=int(correspondencia[2]), day=1)
+
+    return inicio, inicio + pd.offsets.MonthBegin(1)
+
+
+def _agrupar_objetos(objetos: list[dict], extensoes: tuple[str, ...],
+                     tabelas: dict[str, str]) -> tuple[dict[str, dict[str, list[dict]]], dict[str, list[dict]]]:
+    """
+    Agrupa os objetos listados por tabela e extensão; cada arquivo de uma tabela é
+    tratado como um shard (por exemplo, transacao_20240101.csv e transacao_20240102.csv).
+    As cópias gravadas por compactar_entradas_parquet em COMPACTADOS_PREFIXO ficam à parte.
+
+    :param objetos: Objetos listados do bucket
+    :param extensoes: Extensões aceitas
+    :param tabelas: Dicionário {nome da tabela: trecho do nome do arquivo}, em ordem de prioridade
+    :return shards: Dicionário {nome da tabela: {extensão: objetos ordenados pela chave}}
+    :return compactados: Dicionário {nome da tabela: parquets compactados (arquivo único ou
+        partições mensais) ordenados pela chave}
+    """
+    shards = {}
+    compactados = {}
+    for obj in objetos:
+        file_key = obj['Key']
+        extensao, _ = _formato_objeto(file_key)
+
+        if extensao not in extensoes:
+            continue
+
+        # A tabela registrada no manifesto prevalece sobre o nome do arquivo
+        tabela = obj.get('tabela')
+        if tabela is None:
+            file_name = file_key.split('/')[-1].lower()
+            tabela = next((nome for nome, trecho in tabelas.items() if trecho in file_name), None)
+
+        if tabela is None or tabela not in tabelas:
+            continue
+
+        versao = obj.get('versao_esquema')
+        if versao is not None and tabela in ESQUEMAS_TABELAS and versao != ESQUEMAS_TABELAS[tabela]['versao']:
+            print(f"Aviso: {file_key} foi registrado com a versão {versao} do esquema de {tabela}, "
+                  f"mas a versão atual é {ESQUEMAS_TABELAS[tabela]['versao']}")
+
+        if file_key.startswith(COMPACTADOS_PREFIXO):
+            if extensao == '.parquet':
+                compactados.setdefault(tabela, []).append(obj)
+            continue
+
+        shards.setdefault(tabela, {}).setdefault(extensao, []).append(obj)
+
+    for por_extensao in shards.values():
+        for objs in por_extensao.values():
+            objs.sort(key=lambda obj: obj['Key'])
+    for objs in compactados.values():
+        objs.sort(key=lambda obj: obj['Key'])
+
+    return shards, compactados
+
+
+def _shards_pendentes(registro: dict | None, compactados: list[dict], csvs: list[dict]) -> list[dict] | None:
+    """
+    Compara o checkpoint de uma tabela com os objetos atuais do bucket.
+
+    :param registro: Entrada da tabela no checkpoint ({'ingeridos': {chave: ETag}, 'compactados': {chave: ETag}})
+    :param compactados: Parquets atuais da tabela (arquivos únicos e partições)
+    :param csvs: Shards CSV atuais da tabela
+    :return pendentes: Shards CSV ainda não ingeridos nos parquets, ou None se o checkpoint
+        não corresponde mais aos objetos atuais (parquet regravado ou shard alterado ou removido)
+    """
+    if not registro or not compactados:
+        return None
+
+    if registro['compactados'] != {obj['Key']: obj['ETag'] for obj in compactados}:
+        return None
+
+    etags_csvs = {obj['Key']: obj['ETag'] for obj in csvs}
+    if any(etags_csvs.get(chave) != etag for chave, etag in registro['ingeridos'].items()):
+        return None
+
+    return [obj for obj in csvs if obj['Key'] not in registro['ingeridos']]
+
+
+def _selecionar_objetos(objetos: list[dict], extensoes: tuple[str, ...],
+                        tabelas: dict[str, str], checkpoint: dict | None = None) -> dict[str, list[dict]]:
+    """
+    Escolhe os objetos de cada tabela entre os arquivos listados.
+
+    Todos os arquivos de uma tabela com a mesma extensão são lidos como shards e concatenados.
+    As extensões estão em ordem de preferência: os shards de extensão menos preferida
+    só são usados se não houver outros de extensão preferida ou se forem mais recentes
+    (por exemplo, um CSV enviado depois de um parquet da mesma tabela).
+
+    Quando os CSVs são os escolhidos e o checkpoint de compactar_entradas_parquet ainda é
+    válido, são lidos os parquets compactados mais apenas os shards CSV que chegaram
+    depois da última compactação.
+
+    :param objetos: Objetos listados do bucket
+    :param extensoes: Extensões aceitas, da mais para a menos preferida
+    :param tabelas: Dicionário {nome da tabela: trecho do nome do arquivo}, em ordem de prioridade
+    :param checkpoint: Checkpoint da pasta (ver _ler_checkpoint); None ignora o checkpoint
+    :return selecionados: Dicionário {nome da tabela: objetos a serem lidos e concatenados}
+    """
+    shards, compactados = _agrupar_objetos(objetos, extensoes, tabelas)
+
+    selecionados = {}
+    for tabela, por_extensao in shards.items():
+        for extensao in extensoes:
+            objs = por_extensao.get(extensao)
+            if not objs:
+                continue
+            atual = selecionados.get(tabela)
+            if atual is None or max(obj['LastModified'] for obj in objs) > max(obj['LastModified'] for obj in atual):
+                selecionados[tabela] = objs
+
+    if checkpoint and '.parquet' in extensoes and '.csv' in extensoes:
+        for tabela, por_extensao in shards.items():
+            csvs = por_extensao.get('.csv')
+            if not csvs or selecionados.get(tabela) is not csvs:
+                continue
+            pendentes = _shards_pendentes(checkpoint.get(tabela), compactados.get(tabela, []), csvs)
+            if pendentes is not None:
+                selecionados[tabela] = compactados[tabela] + pendentes
+
+    return selecionados
+
+
+def listar_entradas(prefixo: str = 'input/') -> dict:
+    """
+    Lista os objetos de uma pasta do bucket e lê o seu checkpoint uma única vez.
+
+    A listagem é repassada aos loaders de uma mesma página (agregados, snapshot e
+    arquivos), que assim não buscam de novo o manifesto e o checkpoint cada um.
+
+    :param prefixo: Pasta do bucket a ser listada
+    :return listagem: Dicionário {'prefixo': pasta, 'objetos': objetos listados (ver _listar_objetos),
+        'checkpoint': checkpoint da pasta (ver _ler_checkpoint)}
+    """
+    return {'prefixo': prefixo, 'objetos': _listar_objetos(prefixo), 'checkpoint': _ler_checkpoint(prefixo)}
+
+
+def _selecionar_entradas(listagem: dict | None = None) -> dict[str, list[dict]]:
+    """
+    Escolhe os objetos de cada tabela da pasta input, como fazem os loaders de CSV.
+
+    :param listagem: Listagem da pasta input (ver listar_entradas); None lista a pasta
+    :return selecionados: Dicionário {nome da tabela: objetos a serem lidos e concatenados}
+    """
+    listagem = listagem or listar_entradas('input/')
+
+    return _selecionar_objetos(
+        listagem['objetos'], ('.parquet', '.csv'), TABELAS_PASTAS['input/'], listagem['checkpoint']
+    )
+
+
+def _concatenar_partes(partes: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatena os dataframes lidos de várias partes de uma mesma tabela.
+
+    As colunas categóricas recebem antes a união das categorias de todas as partes;
+    sem isso, o pandas converteria para object as colunas com categorias diferentes.
+
+    :param partes: Dataframes de cada parte, na ordem em que devem ser concatenados
+    :return df: Dataframe único com todas as partes
+    """
+    if len(partes) == 1:
+        return partes[0]
+
+    # As partes podem vir do cache compartilhado de _ler_objeto: as colunas com as novas
+    # categorias são criadas em cópias rasas, sem alterar os dataframes recebidos
+    for coluna in partes[0].columns:
+        if isinstance(partes[0][coluna].dtype, pd.CategoricalDtype):
+            categorias = union_categoricals([parte[coluna] for parte in partes]).categories
+            partes = [parte.assign(**{coluna: parte[coluna].cat.set_categories(categorias)}) for parte in partes]
+
+    return pd.concat(partes, ignore_index=True)
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _ler_tabela(origem: str, tabela: str, objetos: tuple[tuple[str, str, int], ...],
+                colunas: tuple[str, ...] | None = None, filtros: tuple[tuple, ...] | None = None) -> pd.DataFrame:
+    """
+    Lê e concatena todas as partes de uma tabela, mantendo uma única cópia em memória por processo.
+
+    A tabela inteira ocupa uma única entrada do cache, com a chave e o ETag de todas as
+    partes, as colunas e os filtros: uma tabela particionada em dezenas de meses não
+    disputa o cache parte a parte, e qualquer parte substituída no bucket gera uma nova
+    leitura. As partes são baixadas e lidas em paralelo, em até MAX_DOWNLOADS_PARALELOS
+    threads, e não ficam guardadas separadamente.
+
+    :param origem: Nome do armazenamento (get_armazenamento().nome), parte da chave do cache
+    :param tabela: Nome da tabela, usado para escolher o esquema
+    :param objetos: Partes da tabela, como tuplas (chave, ETag, tamanho) na ordem de leitura
+    :param colunas: Colunas a serem lidas; None lê todas
+    :param filtros: Condições (coluna, operador, valor) que as linhas devem atender; None lê todas
+    :return df: Dataframe com todas as partes concatenadas
+    """
+    armazenamento = get_armazenamento()
+    ctx = get_script_run_ctx()
+
+    def ler_parte(parte: tuple[str, str, int]) -> pd.DataFrame:
+        add_script_run_ctx(threading.current_thread(), ctx)
+        file_key, etag, tamanho = parte
+        inicio = time.perf_counter()
+        try:
+            df = _ler_arquivo(file_key, etag, tamanho, tabela, colunas, filtros)
+        except Exception as e:
+            print(f"Erro ao ler arquivo {file_key}: {str(e)}")
+            raise
+
+        print(f"Arquivo {file_key} de {tabela} lido com sucesso! "
+              f"({tamanho / 1024 ** 2:.1f} MB em {time.perf_counter() - inicio:.2f} s de {armazenamento.nome})")
+        return df
+
+    # Baixa e lê as partes em paralelo; o tempo total passa a ser o do maior arquivo
+    with ThreadPoolExecutor(max_workers=min(MAX_DOWNLOADS_PARALELOS, len(objetos))) as executor:
+        partes = list(executor.map(ler_parte, objetos))
+
+    return _concatenar_partes(partes)
+
+
+def _ler_arquivos_bucket(prefixo: str, extensoes: tuple[str, ...], tabelas: dict[str, str],
+                         requisitos: dict[str, list[str] | None] | None = None,
+                         filtros: dict[str, list[tuple]] | None = None,
+                         periodo: tuple | None = None, listagem: dict | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Lista os arquivos de uma pasta do bucket e lê aqueles que correspondem às tabelas pedidas.
+
+    As tabelas são lidas em paralelo e os arquivos de cada uma por _ler_tabela, que mantém
+    a tabela concatenada em cache. Os dataframes são devolvidos como cópias rasas do
+    cache compartilhado: com o copy-on-write do pandas, as
+    alterações feitas pelas funções de transformação copiam apenas as colunas alteradas,
+    e o cache mantém uma única cópia de cada tabela para todas as sessões.
+
+    Com um período informado, as tabelas de PARTICOES_TABELAS são limitadas às datas
+    do período: apenas as partições mensais que o cruzam são baixadas e as linhas
+    fora dele são descartadas na leitura.
+
+    Se alguma parte de uma tabela não puder ser lida (por exemplo, um objeto substituído
+    depois de gerado o manifesto), o bucket é listado novamente, sem o manifesto, e as
+    tabelas que falharam são lidas outra vez; se ainda assim falharem, a leitura gera um
+    erro em vez de devolver um dataframe vazio no lugar dos dados.
+
+    :param prefixo: Pasta do bucket a ser listada
+    :param extensoes: Extensões aceitas, da mais para a menos preferida (ver _selecionar_objetos)
+    :param tabelas: Dicionário {nome da tabela: trecho do nome do arquivo}, em ordem de prioridade
+    :param requisitos: Dicionário {nome da tabela: colunas} com as tabelas e colunas usadas pela página;
+        colunas None lê a tabela inteira e None lê todas as tabelas por completo
+    :param filtros: Dicionário {nome da tabela: [(coluna, operador, valor), ...]} com as condições
+        que as linhas de cada tabela devem atender
+    :param periodo: Datas inicial e final (inclusivas) das tabelas particionadas; None lê todo o histórico
+    :param listagem: Listagem já feita da pasta (ver listar_entradas); None lista a pasta
+    :return dfs: Dicionário {nome da tabela: dataframe}, com dataframes vazios para as tabelas não encontradas
+    """
+    dfs = {tabela: pd.DataFrame() for tabela in tabelas}
+    filtros = {tabela: list(condicoes) for tabela, condicoes in (filtros or {}).items()}
+
+    if periodo is not None:
+        inicio_periodo = pd.Timestamp(periodo[0]).normalize()
+        fim_periodo = pd.Timestamp(periodo[1]).normalize() + pd.Timedelta(days=1)
+
+        for tabela, coluna_data in PARTICOES_TABELAS.items():
+            if tabela in tabelas and (requisitos is None or tabela in requisitos):
+                filtros.setdefault(tabela, []).extend(
+                    [(coluna_data, '>=', inicio_periodo), (coluna_data, '<', fim_periodo)]
+                )
+
+    def selecionar(objetos_listados: list[dict], checkpoint: dict | None) -> dict[str, list[dict]]:
+        # Tabelas que a página não usa nem são baixadas
+        objetos = {
+            tabela: objs
+            for tabela, objs in _selecionar_objetos(objetos_listados, extensoes, tabelas, checkpoint).items()
+            if requisitos is None or tabela in requisitos
+        }
+
+        if periodo is not None:
+            for tabela in PARTICOES_TABELAS:
+                if tabela not in objetos:
+                    continue
+
+                # Descarta as partições de meses fora do período
+                objs_periodo = []
+                for obj in objetos[tabela]:
+                    periodo_obj = _periodo_particao(obj['Key'])
+                    if periodo_obj is None or (periodo_obj[0] < fim_periodo and periodo_obj[1] > inicio_periodo):
+                        objs_periodo.append(obj)
+                objetos[tabela] = objs_periodo
+
+        return objetos
+
+    try:
+        # Lista todos os objetos na pasta
+        armazenamento = get_armazenamento()
+        if listagem is None or listagem['prefixo'] != prefixo:
+            listagem = {
+                'prefixo': prefixo,
+                'objetos': _listar_objetos(prefixo),
+                'checkpoint': _ler_checkpoint(prefixo) if len(extensoes) > 1 else None,
+            }
+
+        # Verifica se existem objetos
+        if not listagem['objetos']:
+            print(f"Nenhum arquivo encontrado em {prefixo}")
+            return dfs
+
+        objetos = selecionar(listagem['objetos'], listagem['checkpoint'] if len(extensoes) > 1 else None)
+
+        ctx = get_script_run_ctx()
+
+        def ler_tabela(tabela: str, objs: list[dict]) -> pd.DataFrame | None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+            try:
+                colunas = requisitos.get(tabela) if requisitos is not None else None
+                colunas = tuple(colunas) if colunas is not None else None
+                filtros_tabela = filtros.get(tabela)
+                filtros_tabela = tuple(
+                    (coluna, operador, tuple(valor) if isinstance(valor, (list, set)) else valor)
+                    for coluna, operador, valor in filtros_tabela
+                ) if filtros_tabela else None
+                partes = tuple((obj['Key'], obj['ETag'], obj['Size']) for obj in objs)
+                df = _ler_tabela(armazenamento.nome, tabela, partes, colunas, filtros_tabela).copy(deep=False)
+            except Exception as e:
+                print(f"Erro ao ler a tabela {tabela}: {str(e)}")
+                df = None
+
+            return df
+
+        def ler_tabelas(objetos: dict[str, list[dict]]) -> list[str]:
+            objetos = {tabela: objs for tabela, objs in objetos.items() if objs}
+
+            if not objetos:
+                return []
+
+            with ThreadPoolExecutor(max_workers=len(objetos)) as executor:
+                futuros = {tabela: executor.submit(ler_tabela, tabela, objs) for tabela, objs in objetos.items()}
+
+            # Uma tabela só é devolvida se todas as suas partes foram lidas
+            falhas = []
+            for tabela, futuro in futuros.items():
+                df = futuro.result()
+                if df is None:
+                    falhas.append(tabela)
+                    continue
+
+                dfs[tabela] = df
+
+            return falhas
+
+        falhas = ler_tabelas(objetos)
+
+        if falhas:
+            # O manifesto ou o checkpoint podem estar desatualizados (objeto substituído ou removido
+            # depois de gerados, o que faz o GET condicional falhar com PreconditionFailed): lista o
+            # bucket diretamente e lê outra vez apenas as tabelas que falharam
+            print(f"Falha ao ler {', '.join(falhas)}; listando o bucket novamente")
+            objetos = selecionar(
+                _listar_objetos_paginado(prefixo), _ler_checkpoint(prefixo) if len(extensoes) > 1 else None
+            )
+            falhas = ler_tabelas({tabela: objetos[tabela] for tabela in falhas if tabela in objetos})
+
+            if falhas:
+                raise IOError(f"Não foi possível ler as tabelas {', '.join(falhas)} de {prefixo}")
+
+        return dfs
+
+    except Exception as e:
+        print(f"Erro ao listar objetos do armazenamento: {str(e)}")
+        raise
+
+
+# Criar função para ler parquets e transformar em dataframe
+def read_parquet_files_eda(requisitos: dict[str, list[str] | None] | None = None,
+                           filtros: dict[str, list[tuple]] | None = None,
+                           periodo: tuple | None = None) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Lê os arquivos parquet específicos da pasta input do bucket
+    e retorna três dataframes: clientes, navegacao e transacao.
+
+    :param requisitos: Tabelas e colunas usadas pela página ({tabela: colunas}); None lê tudo
+    :param filtros: Condições de cada tabela ({tabela: [(coluna, operador, valor), ...]}); None lê todas as linhas
+    :param periodo: Datas inicial e final (inclusivas) das transações; None lê todo o histórico
+    :return df_clientes: Dataframe com os dados dos clientes
+    :return df_navegacao: Dataframe com os dados de navegação
+    :return df_transacao: Dataframe com os dados de transações
+    """
+    dfs = _ler_arquivos_bucket(
+        'input/', ('.parquet',),
+        TABELAS_PASTAS['input/'],
+        requisitos,
+        filtros,
+        periodo
+    )
+
+    return dfs['clientes'], dfs['navegacao'], dfs['transacao']
+
+
+# Criar função para ler csvs e transformar em dataframe
+def read_csv_files_eda(requisitos: dict[str, list[str] | None] | None = None,
+                       filtros: dict[str, list[tuple]] | None = None,
+                       periodo: tuple | None = None, listagem: dict | None = None) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Lê os arquivos CSV específicos da pasta input do bucket
+    e retorna três dataframes: clientes, navegacao e transacao.
+    Todos os arquivos de cada tabela (por exemplo, transacao_*.csv) são lidos como shards
+    e concatenados. Quando existe a cópia parquet gerada por compactar_entradas_parquet,
+    ela é lida no lugar dos shards já compactados.
+
+    :param requisitos: Tabelas e colunas usadas pela página ({tabela: colunas}); None lê tudo
+    :param filtros: Condições de cada tabela ({tabela: [(coluna, operador, valor), ...]}); None lê todas as linhas
+    :param periodo: Datas inicial e final (inclusivas) das transações; None lê todo o histórico
+    :param listagem: Listagem da pasta input já feita pela página (ver listar_entradas); None lista a pasta
+    :return df_clientes: Dataframe com os dados dos clientes
+    :return df_navegacao: Dataframe com os dados de navegação
+    :return df_transacao: Dataframe com os dados de transações
+    """
+    dfs = _ler_arquivos_bucket(
+        'input/', ('.parquet', '.csv'),
+        TABELAS_PASTAS['input/'],
+        requisitos,
+        filtros,
+        periodo,
+        listagem
+    )
+
+    return dfs['clientes'], dfs['navegacao'], dfs['transacao']
+
+
+def _gravar_parquet(df: pd.DataFrame, tabela: str, parquet_key: str) -> int:
+    """
+    Grava um dataframe no bucket como parquet otimizado para leitura.
 
-    :return s3_client: Retorna o cliente S3 criado
+    As linhas são ordenadas pelas chaves de ORDENACAO_PARQUET (o que deixa as
+    estatísticas dos row groups bem delimitadas) e o arquivo usa compressão zstd e
+    codificação por dicionário nas colunas categóricas do esquema.
+
+    :param df: Dataframe a ser gravado
+    :param tabela: Nome da tabela em ESQUEMAS_TABELAS
+    :param parquet_key: Chave do arquivo no bucket
+    :return tamanho: Tamanho do arquivo gravado em bytes
+    """
+
+    chaves = [coluna for coluna in ORDENACAO_PARQUET.get(tabela, []) if coluna in df.columns]
+    if chaves:
+        df = df.sort_values(chaves, kind='stable', ignore_index=True)
+
+    colunas_dicionario = [coluna for coluna, tipo in ESQUEMAS_TABELAS[tabela]['tipos'].items()
+                          if tipo == 'category' and coluna in df.columns]
+
+    buffer = io.BytesIO()
+    df.to_parquet(
+        buffer,
+        engine='pyarrow',
+        index=False,
+        compression='zstd',
+        compression_level=PARQUET_NIVEL_ZSTD,
+        row_group_size=PARQUET_LINHAS_ROW_GROUP,
+        use_dictionary=colunas_dicionario,
+        write_statistics=True
+    )
+    tamanho = buffer.tell()
+    buffer.seek(0)
+
+    get_armazenamento().gravar(parquet_key, buffer)
+
+    return tamanho
+
+
+def _gravar_particoes(df: pd.DataFrame, tabela: str) -> tuple[int, set[str]]:
+    """
+    Grava uma tabela em partições mensais de COMPACTADOS_PREFIXO, pela coluna de PARTICOES_TABELAS.
+
+    :param df: Dataframe a ser gravado
+    :param tabela: Nome da tabela em PARTICOES_TABELAS
+    :return tamanho: Soma dos tamanhos das partições gravadas em bytes
+    :return chaves_gravadas: Chaves das partições gravadas
+    """
+    coluna_data = PARTICOES_TABELAS[tabela]
+    prefixo_tabela = f'{COMPACTADOS_PREFIXO}{tabela}/'
+
+    tamanho = 0
+    chaves_gravadas = set()
+    for mes, df_mes in df.groupby(df[coluna_data].dt.to_period('M'), sort=True):
+        parquet_key = f'{prefixo_tabela}ano={mes.year:04d}/mes={mes.month:02d}/{tabela}.parquet'
+        tamanho += _gravar_parquet(df_mes, tabela, parquet_key)
+        chaves_gravadas.add(parquet_key)
+
+    print(f"{tabela} gravada em {len(chaves_gravadas)} partições mensais em {prefixo_tabela}")
+
+    return tamanho, chaves_gravadas
+
+
+def _ler_shards(tabela: str, objs: list[dict], colunas: tuple[str, ...] | None = None) -> pd.DataFrame:
+    """
+    Lê em paralelo e concatena os arquivos de uma tabela do bucket.
+
+    :param tabela: Nome da tabela em ESQUEMAS_TABELAS
+    :param objs: Objetos a serem lidos, na ordem em que devem ser concatenados
+    :param colunas: Colunas a serem lidas; None lê todas
+    :return df: Dataframe com todos os arquivos
+    """
+    armazenamento = get_armazenamento()
+
+    def ler_shard(obj: dict) -> pd.DataFrame:
+        return _ler_objeto(armazenamento.nome, obj['Key'], obj['ETag'], obj['Size'], tabela, colunas)
+
+    with ThreadPoolExecutor(max_workers=min(MAX_DOWNLOADS_PARALELOS, len(objs))) as executor:
+        partes = list(executor.map(ler_shard, objs))
+
+    return _concatenar_partes(partes)
+
+
+def compactar_entradas_parquet() -> None:
+    """
+    Converte os shards CSV da pasta input do bucket em arquivos parquet otimizados para leitura.
+
+    Os shards de cada tabela são lidos com o seu esquema, concatenados e gravados por
+    _gravar_parquet em input/_compactados/<tabela>.parquet; as tabelas de PARTICOES_TABELAS
+    são gravadas em partições mensais. Os loaders leem essas cópias no lugar dos CSVs
+    enquanto o checkpoint da pasta for válido.
+
+    A compactação é incremental: o checkpoint da pasta registra os shards já ingeridos e,
+    enquanto ele for válido, apenas os shards novos são lidos e somente os parquets que
+    recebem linhas (as partições dos seus meses) são regravados. Um shard alterado ou
+    removido faz a tabela ser compactada do zero. Ao final, o checkpoint e o manifesto da
+    pasta são regravados.
+
+    O job só grava em COMPACTADOS_PREFIXO e só remove as cópias que ele mesmo gravou e
+    registrou no checkpoint; os arquivos enviados para a pasta input nunca são alterados.
+    """
+    armazenamento = get_armazenamento()
+    tabelas = TABELAS_PASTAS['input/']
+    shards, compactados = _agrupar_objetos(_listar_objetos_paginado('input/'), ('.parquet', '.csv'), tabelas)
+    checkpoint = _ler_checkpoint('input/')
+
+    ingeridos = {}
+    gravados = {}
+    for tabela, por_extensao in shards.items():
+        csvs = por_extensao.get('.csv', [])
+        if not csvs:
+            continue
+
+        inicio = time.perf_counter()
+        registro = checkpoint.get(tabela)
+        compactados_tabela = compactados.get(tabela, [])
+        pendentes = _shards_pendentes(registro, compactados_tabela, csvs)
+        ingeridos[tabela] = {obj['Key']: obj['ETag'] for obj in csvs}
+
+        # Cópias gravadas pelo job em execuções anteriores, as únicas que ele pode remover
+        anteriores = {chave for chave in (registro or {}).get('compactados', {})
+                      if chave.startswith(COMPACTADOS_PREFIXO)}
+
+        if pendentes == []:
+            gravados[tabela] = anteriores
+            print(f"{tabela}: nenhum shard novo desde a última compactação")
+            continue
+
+        incremental = pendentes is not None
+        lidos = pendentes if incremental else csvs
+        df = _ler_shards(tabela, lidos)
+
+        coluna_data = PARTICOES_TABELAS.get(tabela)
+        particionada = coluna_data is not None and df[coluna_data].notna().all()
+        particoes = [obj for obj in compactados_tabela if _periodo_particao(obj['Key']) is not None]
+
+        if incremental and particionada and particoes and len(particoes) == len(compactados_tabela):
+            # Regrava apenas as partições dos meses que receberam linhas novas
+            meses = set(df[coluna_data].dt.to_period('M'))
+            afetadas = [parte for parte in particoes
+                        if pd.Period(_periodo_particao(parte['Key'])[0], 'M') in meses]
+            if afetadas:
+                df = _concatenar_partes([_ler_shards(tabela, afetadas), df])
+            destino = f'{COMPACTADOS_PREFIXO}{tabela}/'
+            tamanho_parquet, chaves = _gravar_particoes(df, tabela)
+            gravados[tabela] = anteriores | chaves
+
+        else:
+            if incremental:
+                df = _concatenar_partes([_ler_shards(tabela, compactados_tabela), df])
+                particionada = coluna_data is not None and df[coluna_data].notna().all()
+
+            if particionada:
+                destino = f'{COMPACTADOS_PREFIXO}{tabela}/'
+                tamanho_parquet, chaves = _gravar_particoes(df, tabela)
+            else:
+                if coluna_data is not None:
+                    print(f"{tabela} possui linhas sem {coluna_data} e será gravada sem particionamento")
+                destino = f'{COMPACTADOS_PREFIXO}{tabela}.parquet'
+                tamanho_parquet = _gravar_parquet(df, tabela, destino)
+                chaves = {destino}
+
+            # Remove apenas as cópias que o job gravou antes e que não foram regravadas agora
+            for chave in sorted(anteriores - chaves):
+                armazenamento.remover(chave)
+            gravados[tabela] = chaves
+
+        tamanho_csv = sum(obj['Size'] for obj in lidos)
+        print(f"{len(lidos)} shards de {tabela} compactados em {destino}: "
+              f"{tamanho_csv / 1024 ** 2:.1f} MB -> {tamanho_parquet / 1024 ** 2:.1f} MB "
+              f"em {time.perf_counter() - inicio:.1f} s")
+
+    # O checkpoint relaciona os shards ingeridos às cópias compactadas gravadas pelo job
+    _, compactados = _agrupar_objetos(_listar_objetos_paginado('input/'), ('.parquet',), tabelas)
+    registros = {
+        tabela: {
+            'ingeridos': etags,
+            'compactados': {obj['Key']: obj['ETag'] for obj in compactados.get(tabela, [])
+                            if obj['Key'] in gravados[tabela]},
+        }
+        for tabela, etags in ingeridos.items()
+    }
+    checkpoint = {'gerado_em': datetime.now().astimezone().isoformat(), 'tabelas': registros}
+    armazenamento.gravar(f'input/{CHECKPOINT_NOME}', json.dumps(checkpoint, indent=2).encode('utf-8'))
+
+    gerar_manifesto('input/')
+
+
+# Snapshot local das tabelas de entrada já tratadas, em Arrow IPC (Feather) sem compressão.
+# Os arquivos são mapeados em memória por todos os processos do servidor, que passam a
+# dividir uma única cópia dos dados no cache de páginas do sistema operacional
+SNAPSHOT_DIR = os.getenv('RENNER_SNAPSHOT_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'renner_rethink_snapshot'))
+SNAPSHOT_TABELAS = ('clientes', 'navegacao', 'transacao')
+SNAPSHOT_METADADO_ORIGEM = b'renner_origem'
+
+# Colunas criadas pelo tratamento, sempre devolvidas junto com as colunas pedidas
+SNAPSHOT_COLUNAS_DERIVADAS = {
+    'clientes': ['capital', 'capital_label'],
+}
+
+
+def _origem_objetos(objetos: list[dict]) -> bytes:
+    """
+    Identifica a versão dos objetos do bucket a partir dos quais uma tabela foi lida
+    (usada pelo snapshot Arrow e pelos agregados dos gráficos).
+
+    :param objetos: Objetos da tabela selecionados por _selecionar_objetos
+    :return origem: Lista serializada de pares (chave, ETag)
+    """
+    return json.dumps(sorted([obj['Key'], obj['ETag']] for obj in objetos)).encode('utf-8')
+
+
+def gerar_snapshot_arrow() -> None:
+    """
+    Grava em SNAPSHOT_DIR o snapshot Arrow das tabelas de entrada já tratadas: clientes
+    após converte_data_clientes e aplicar_limpeza_cidades, navegacao e transacao.
+
+    Deve ser executado em cada servidor sempre que os arquivos do bucket mudarem; cada
+    arquivo registra nos metadados a versão dos objetos de origem, e read_snapshot_arrow
+    ignora o snapshot enquanto ele estiver desatualizado. A troca dos arquivos é atômica,
+    então processos que ainda mapeiam a versão anterior continuam lendo-a normalmente.
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+
+    listagem = listar_entradas('input/')
+    objetos = _selecionar_entradas(listagem)
+    df_clientes, df_navegacao, df_transacao = read_csv_files_eda(listagem=listagem)
+    df_clientes = aplicar_limpeza_cidades(converte_data_clientes(df_clientes))
+
+    for tabela, df in zip(SNAPSHOT_TABELAS, (df_clientes, df_navegacao, df_transacao)):
+        tabela_arrow = pa.Table.from_pandas(df, preserve_index=False)
+        tabela_arrow = tabela_arrow.replace_schema_metadata({
+            **(tabela_arrow.schema.metadata or {}),
+            SNAPSHOT_METADADO_ORIGEM: _origem_objetos(objetos.get(tabela, [])),
+        })
+
+        # Sem compressão, para que as colunas possam ser usadas direto do mapeamento
+        caminho = os.path.join(SNAPSHOT_DIR, f'{tabela}.arrow')
+        caminho_tmp = f'{caminho}.{os.getpid()}.tmp'
+        feather.write_feather(tabela_arrow, caminho_tmp, compression='uncompressed')
+        os.replace(caminho_tmp, caminho)
+
+        print(f"Snapshot de {tabela} gravado em {caminho} "
+              f"({len(df)} linhas, {os.path.getsize(caminho) / 1024 ** 2:.1f} MB)")
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _mapear_snapshot(caminho: str, versao: int) -> pa.Table:
+    """
+    Mapeia em memória um arquivo do snapshot, sem copiar os dados.
+
+    Fica em cache por processo: todas as sessões usam a mesma tabela, cujas colunas
+    apontam para as páginas do arquivo compartilhadas entre os processos.
+
+    :param caminho: Caminho do arquivo Arrow
+    :param versao: Data de modificação do arquivo (usada apenas como chave do cache)
+    :return tabela: Tabela Arrow mapeada
+    """
+    return pa.ipc.open_file(pa.memory_map(caminho, 'r')).read_all()
+
+
+def read_snapshot_arrow(requisitos: dict[str, list[str] | None] | None = None, listagem: dict | None = None
+                        ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame] | None:
+    """
+    Lê as tabelas clientes (já tratada), navegacao e transacao do snapshot Arrow local.
+
+    As colunas numéricas e de datas (datetime64) são convertidas para pandas sem cópia,
+    como arrays somente leitura sobre o arquivo mapeado; as demais são materializadas a
+    cada chamada. Por isso os dataframes devolvidos são somente leitura: qualquer
+    alteração no lugar (df.loc[...] = ..., fillna(inplace=True), +=) gera ValueError.
+    Quem precisar alterar valores deve copiar antes (df.copy()); criar colunas novas ou
+    filtrar linhas, que já produzem outro dataframe, não tocam o arquivo mapeado.
+
+    :param requisitos: Tabelas e colunas usadas pela página ({tabela: colunas}); None lê tudo
+    :param listagem: Listagem da pasta input já feita pela página (ver listar_entradas); None lista a pasta
+    :return dfs: Dataframes de clientes, navegacao e transacao, ou None se o snapshot
+        não existe ou está desatualizado em relação ao bucket
     """
     try:
-        aws_access_key = st.secrets.get("AWS_ACCESS_KEY_ID")
-        aws_secret_key = st.secrets.get("AWS_SECRET_ACCESS_KEY")
+        objetos = _selecionar_entradas(listagem)
 
-        if not aws_access_key or not aws_secret_key:
-            aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-            aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+        dfs = {}
+        for tabela in SNAPSHOT_TABELAS:
+            if requisitos is not None and tabela not in requisitos:
+                dfs[tabela] = pd.DataFrame()
+                continue
 
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=aws_access_key,
-            aws_secret_access_key=aws_secret_key,
-            region_name='us-east-1'
-        )
+            caminho = os.path.join(SNAPSHOT_DIR, f'{tabela}.arrow')
+            if not os.path.exists(caminho):
+                print(f"Snapshot de {tabela} não encontrado em {SNAPSHOT_DIR}")
+                return None
 
-        return s3_client
+            tabela_arrow = _mapear_snapshot(caminho, os.stat(caminho).st_mtime_ns)
+            if tabela_arrow.schema.metadata.get(SNAPSHOT_METADADO_ORIGEM) != _origem_objetos(objetos.get(tabela, [])):
+                print(f"Snapshot de {tabela} desatualizado em relação ao bucket")
+                return None
+
+            # Mantém a ordem das colunas do arquivo, como nos demais loaders
+            colunas = requisitos.get(tabela) if requisitos is not None else None
+            if colunas is not None:
+                colunas = set(colunas) | set(SNAPSHOT_COLUNAS_DERIVADAS.get(tabela, []))
+                tabela_arrow = tabela_arrow.select([coluna for coluna in tabela_arrow.column_names if coluna in colunas])
+
+            # Datas sempre como datetime64, mesmo em snapshots gravados com colunas date
+            dfs[tabela] = tabela_arrow.to_pandas(split_blocks=True, date_as_object=False)
+
+        return dfs['clientes'], dfs['navegacao'], dfs['transacao']
 
     except Exception as e:
-        print(f"Erro ao criar cliente S3: {str(e)}")
-        raise
+        print(f"Erro ao ler o snapshot Arrow: {str(e)}")
+        return None
 
 
-# Criar função para ler parquets e transformar em dataframe
-def read_parquet_files_eda() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+def calcular_agregados_eda(df_clientes: pd.DataFrame, df_navegacao: pd.DataFrame,
+                           df_transacao: pd.DataFrame) -> dict[str, pd.DataFrame | pd.Series]:
     """
-    Lê os arquivos parquet específicos da pasta input do bucket
-    e retorna três dataframes: clientes, navegacao e transacao.
+    Calcula as entradas resumidas dos gráficos da página de análise exploratória.
 
-    :return df_clientes: Dataframe com os dados dos clientes
-    :return df_navegacao: Dataframe com os dados de navegação
-    :return df_transacao: Dataframe com os dados de transações
+    :param df_clientes: Dataframe de clientes após converte_data_clientes e aplicar_limpeza_cidades
+    :param df_navegacao: Dataframe com os dados de navegação
+    :param df_transacao: Dataframe com os dados de transações
+    :return agregados: Dicionário {nome do agregado: série ou dataframe usado pelo gráfico}
+    """
+    # Gênero e cidades consideram apenas os clientes a partir de 16 anos, como na página
+    df_clientes_16 = df_clientes.loc[df_clientes['idade'] >= 16]
+    cidades_35_percent_data, percentual_acumulado_35 = transformacoes_grafico_cidades(df_clientes_16)
+
+    return {
+        'contagem_capitais': transformacoes_grafico_capitais(df_clientes),
+        'contagem_genero': transformacoes_grafico_genero(df_clientes_16),
+        'cidades_35_percent': cidades_35_percent_data,
+        'percentual_acumulado_35': percentual_acumulado_35,
+        'contagem_eventos': transformacoes_grafico_eventos(df_navegacao),
+        'contagem_tipo_venda': transformacoes_grafico_tipo_venda(df_transacao),
+        'vendas_item': transformacao_grafico_vendas_item(df_transacao),
+        'variacao_itens': transformacoes_grafico_variacao(df_transacao),
+    }
+
+
+def gerar_agregados_graficos() -> None:
     """
-    # Configurações do bucket
-    bucket_name = 'bkt-dev-projcdia-rennerrethink-streamlit'
-    input_prefix = 'input/'
+    Grava em output/agregados/ os agregados dos gráficos das páginas EDA e ETL,
+    calculados uma única vez a partir das tabelas completas de entrada.
+
+    Cada agregado é um parquet pequeno (uma linha por categoria, cidade ou item), e o
+    índice da pasta registra o ETag de cada um e a versão dos objetos de entrada usados.
+    Deve ser executado sempre que os arquivos de entrada mudarem; enquanto isso não
+    acontece, read_agregados_graficos considera os agregados desatualizados.
+    """
+    armazenamento = get_armazenamento()
+
+    listagem = listar_entradas('input/')
+    objetos = _selecionar_entradas(listagem)
+    df_clientes, df_navegacao, df_transacao = read_csv_files_eda(listagem=listagem)
+    df_clientes = aplicar_limpeza_cidades(converte_data_clientes(df_clientes))
+
+    agregados = calcular_agregados_eda(df_clientes, df_navegacao, df_transacao)
+    agregados['variacao_itens_etl'] = transformacoes_etl_heuristicas(df_transacao, agregados['variacao_itens'])
+
+    for nome, agregado in agregados.items():
+        df = agregado.to_frame() if isinstance(agregado, pd.Series) else agregado
+
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, engine='pyarrow', compression='zstd')
+        tamanho = buffer.tell()
+        buffer.seek(0)
+
+        armazenamento.gravar(f'{AGREGADOS_PREFIXO}{nome}.parquet', buffer)
+        print(f"Agregado {nome} gravado ({len(df)} linhas, {tamanho / 1024:.1f} KB)")
+
+    # O índice guarda os ETags para que as páginas leiam os agregados pelo cache de _ler_objeto
+    gravados = {obj['Key']: obj for obj in armazenamento.listar(AGREGADOS_PREFIXO)}
+    indice = {
+        'gerado_em': datetime.now().astimezone().isoformat(),
+        'origem': {tabela: _origem_objetos(objs).decode('utf-8') for tabela, objs in objetos.items()},
+        'agregados': {
+            nome: {
+                'Key': f'{AGREGADOS_PREFIXO}{nome}.parquet',
+                'ETag': gravados[f'{AGREGADOS_PREFIXO}{nome}.parquet']['ETag'],
+                'Size': gravados[f'{AGREGADOS_PREFIXO}{nome}.parquet']['Size'],
+                'serie': isinstance(agregado, pd.Series),
+            }
+            for nome, agregado in agregados.items()
+        },
+    }
+    armazenamento.gravar(AGREGADOS_INDICE, json.dumps(indice, indent=2).encode('utf-8'))
+
+    print(f"Índice dos agregados gravado em {AGREGADOS_INDICE}")
 
-    # Obtém o cliente S3
-    s3_client = get_s3_client()
 
-    # Inicializa os dataframes
-    df_clientes = pd.DataFrame()
-    df_navegacao = pd.DataFrame()
-    df_transacao = pd.DataFrame()
+def read_agregados_graficos(nomes: list[str], listagem: dict | None = None
+                            ) -> dict[str, pd.DataFrame | pd.Series] | None:
+    """
+    Lê os agregados pré-calculados dos gráficos gravados por gerar_agregados_graficos.
+
+    :param nomes: Nomes dos agregados usados pela página
+    :param listagem: Listagem da pasta input já feita pela página (ver listar_entradas); None lista a pasta
+    :return agregados: Dicionário {nome do agregado: série ou dataframe}, ou None se os
+        agregados não existem ou estão desatualizados em relação aos dados de entrada
+    """
+    armazenamento = get_armazenamento()
 
     try:
-        # Lista todos os objetos na pasta input
-        response = s3_client.list_objects_v2(
-            Bucket=bucket_name,
-            Prefix=input_prefix
-        )
+        with closing(armazenamento.abrir(AGREGADOS_INDICE)) as corpo:
+            indice = json.loads(corpo.read())
 
-        # Verifica se existem objetos
-        if 'Contents' not in response:
-            print(f"Nenhum arquivo encontrado em {input_prefix}")
-
-            return df_clientes, df_navegacao, df_transacao
-
-        # Para cada arquivo na pasta input
-        for obj in response['Contents']:
-            file_key = obj['Key']
-
-            # Verifica se é um arquivo parquet
-            if file_key.endswith('.parquet'):
-                try:
-                    # Lê o arquivo parquet
-                    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-                    file_name = file_key.split('/')[-1].lower()
-
-                    if 'cliente' in file_name:
-                        df_clientes = pd.read_parquet(io.BytesIO(response['Body'].read()))
-                        print("Arquivo de clientes lido com sucesso!")
-                    elif 'navegacao' in file_name:
-                        df_navegacao = pd.read_parquet(io.BytesIO(response['Body'].read()))
-                        print("Arquivo de navegação lido com sucesso!")
-                    elif 'transacao' in file_name:
-                        df_transacao = pd.read_parquet(io.BytesIO(response['Body'].read()))
-                        print("Arquivo de transações lido com sucesso!")
-
-                except Exception as e:
-                    print(f"Erro ao ler arquivo {file_key}: {str(e)}")
-                    continue
+        objetos = _selecionar_entradas(listagem)
+        origem = {tabela: _origem_objetos(objs).decode('utf-8') for tabela, objs in objetos.items()}
+        if indice['origem'] != origem:
+            print("Agregados dos gráficos desatualizados em relação aos dados de entrada")
+            return None
+
+        agregados = {}
+        for nome in nomes:
+            entrada = indice['agregados'][nome]
+            df = _ler_objeto(armazenamento.nome, entrada['Key'], entrada['ETag'], entrada['Size']).copy(deep=False)
+            agregados[nome] = df.iloc[:, 0] if entrada['serie'] else df
+
+        return agregados
 
-        return df_clientes, df_navegacao, df_transacao
+    except FileNotFoundError:
+        print(f"Agregados dos gráficos não encontrados em {AGREGADOS_PREFIXO}")
 
     except Exception as e:
-        print(f"Erro ao listar objetos do bucket: {str(e)}")
-        raise
+        print(f"Erro ao ler os agregados dos gráficos: {str(e)}")
 
+    return None
 
-# Criar função para ler csvs e transformar em dataframe
-def read_csv_files_eda() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+
+def _estado_precos_itens(df_transacao: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
-    Lê os arquivos CSV específicos da pasta input do bucket
-    e retorna três dataframes: clientes, navegacao e transacao.
+    Resume as transações no estado das estatísticas de preço dos itens, que pode ser
+    combinado com o de outras transações sem voltar a elas.
 
-    :return df_clientes: Dataframe com os dados dos clientes
-    :return df_navegacao: Dataframe com os dados de navegação
-    :return df_transacao: Dataframe com os dados de transações
+    :param df_transacao: DataFrame com as colunas codigo_item e valor
+    :return estado: DataFrame com codigo_item, qtd, media, m2 (soma dos quadrados dos
+        desvios em relação à média), minimo e maximo de cada item
+    :return contagens: DataFrame com a quantidade de vendas (qtd) de cada par codigo_item e valor
     """
-    # Configurações do bucket
-    bucket_name = 'bkt-dev-projcdia-rennerrethink-streamlit'
-    input_prefix = 'input/'
+    estatisticas = _estatisticas_por_grupo(df_transacao, 'codigo_item', 'valor')
+    qtd = estatisticas['qtd'].to_numpy()
+
+    estado = pd.DataFrame({
+        'codigo_item': estatisticas['codigo_item'],
+        'qtd': qtd,
+        'media': estatisticas['media'],
+        'm2': np.where(qtd > 1, estatisticas['desvio_padrao'] ** 2 * (qtd - 1), 0.0),
+        'minimo': estatisticas['minimo'],
+        'maximo': estatisticas['maximo'],
+    })
+
+    contagens = (df_transacao.loc[df_transacao['valor'].notna(), ['codigo_item', 'valor']]
+                 .value_counts(sort=False)
+                 .rename('qtd')
+                 .reset_index()
+                 .sort_values(['codigo_item', 'valor'], ignore_index=True))
+
+    return estado, contagens
+
+
+def _combinar_estados_precos(estado: pd.DataFrame, contagens: pd.DataFrame,
+                             estado_novo: pd.DataFrame, contagens_novas: pd.DataFrame
+                             ) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Combina dois estados de _estado_precos_itens, como se as transações de ambos
+    tivessem sido resumidas juntas.
+
+    A quantidade, o mínimo e o máximo são combinados diretamente; a média e o m2 pela
+    fórmula de combinação de Chan (a mesma atualização do algoritmo de Welford, aplicada
+    a um lote inteiro), e as contagens por preço são somadas.
+
+    :param estado: Estado atual
+    :param contagens: Contagens por preço do estado atual
+    :param estado_novo: Estado das transações novas
+    :param contagens_novas: Contagens por preço das transações novas
+    :return estado: Estado combinado
+    :return contagens: Contagens por preço combinadas
+    """
+    atual = estado.set_index('codigo_item')
+    novo = estado_novo.set_index('codigo_item')
+    itens = atual.index.union(novo.index)
+    atual, novo = atual.reindex(itens), novo.reindex(itens)
+
+    qtd_atual = atual['qtd'].fillna(0).to_numpy()
+    qtd_novo = novo['qtd'].fillna(0).to_numpy()
+    media_atual = atual['media'].fillna(0).to_numpy()
+    media_novo = novo['media'].fillna(0).to_numpy()
+    qtd = qtd_atual + qtd_novo
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        peso_novo = np.where(qtd > 0, qtd_novo / qtd, 0.0)
+    delta = media_novo - media_atual
+
+    estado = pd.DataFrame({
+        'codigo_item': itens,
+        'qtd': qtd.astype('int64'),
+        'media': np.where(qtd > 0, media_atual + delta * peso_novo, np.nan),
+        'm2': atual['m2'].fillna(0).to_numpy() + novo['m2'].fillna(0).to_numpy() + delta ** 2 * qtd_atual * peso_novo,
+        'minimo': np.fmin(atual['minimo'].to_numpy(), novo['minimo'].to_numpy()),
+        'maximo': np.fmax(atual['maximo'].to_numpy(), novo['maximo'].to_numpy()),
+    })
+
+    contagens = (pd.concat([contagens, contagens_novas], ignore_index=True)
+                 .groupby(['codigo_item', 'valor'], as_index=False, sort=True)['qtd']
+                 .sum())
+
+    return estado, contagens
+
+
+def _estatisticas_do_estado(estado: pd.DataFrame, contagens: pd.DataFrame) -> pd.DataFrame:
+    """
+    Deriva do estado das estatísticas de preço as colunas de _estatisticas_por_grupo.
+
+    :param estado: Estado de _estado_precos_itens ou _combinar_estados_precos
+    :param contagens: Contagens por preço do mesmo estado
+    :return estatisticas: DataFrame com codigo_item, qtd, media, minimo, maximo, desvio_padrao e moda
+    """
+    qtd = estado['qtd'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        desvio_padrao = np.where(qtd > 1, np.sqrt(estado['m2'].to_numpy() / (qtd - 1)), np.nan)
+
+    # Moda: o preço mais vendido de cada item; no empate, o menor, como em Series.mode()[0]
+    modas = (contagens.sort_values(['codigo_item', 'qtd', 'valor'], ascending=[True, False, True])
+             .drop_duplicates('codigo_item')
+             .set_index('codigo_item')['valor'])
+
+    return pd.DataFrame({
+        'codigo_item': estado['codigo_item'],
+        'qtd': qtd,
+        'media': estado['media'],
+        'minimo': estado['minimo'],
+        'maximo': estado['maximo'],
+        'desvio_padrao': desvio_padrao,
+        'moda': modas.reindex(estado['codigo_item']).to_numpy(),
+    })
+
+
+def _fontes_transacao() -> list[dict]:
+    """
+    Lista os arquivos que definem as transações da pasta input: os shards CSV, que
+    permanecem no bucket após a compactação, ou os parquets quando não há CSVs.
+
+    :return fontes: Objetos da tabela transacao ordenados pela chave
+    """
+    shards, _ = _agrupar_objetos(_listar_objetos_paginado('input/'), ('.parquet', '.csv'), TABELAS_PASTAS['input/'])
+    por_extensao = shards.get('transacao', {})
 
-    # Obtém o cliente S3
-    s3_client = get_s3_client()
+    return por_extensao.get('.csv') or por_extensao.get('.parquet', [])
 
-    # Inicializa os dataframes
-    df_clientes = pd.DataFrame()
-    df_navegacao = pd.DataFrame()
-    df_transacao = pd.DataFrame()
+
+def _ler_estado_itens() -> tuple[pd.DataFrame, pd.DataFrame, dict[str, str]] | None:
+    """
+    Lê o estado das estatísticas de preço dos itens gravado por atualizar_metricas_itens.
+
+    :return estado: Estado das estatísticas de preço
+    :return contagens: Contagens por preço
+    :return fontes: Dicionário {chave: ETag} dos arquivos de transação já incorporados ao estado;
+        None no lugar da tupla quando o estado não existe ou não pode ser lido
+    """
+    armazenamento = get_armazenamento()
 
     try:
-        # Lista todos os objetos na pasta input
-        response = s3_client.list_objects_v2(
-            Bucket=bucket_name,
-            Prefix=input_prefix
-        )
+        with closing(armazenamento.abrir(ESTADO_ITENS_INDICE)) as corpo:
+            indice = json.loads(corpo.read())
 
-        # Verifica se existem objetos
-        if 'Contents' not in response:
-            print(f"Nenhum arquivo encontrado em {input_prefix}")
-            return df_clientes, df_navegacao, df_transacao
-
-        # Para cada arquivo na pasta input
-        for obj in response['Contents']:
-            file_key = obj['Key']
-
-            # Verifica se é um arquivo CSV
-            if file_key.endswith('.csv'):
-                try:
-                    # Lê o arquivo CSV
-                    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-                    file_name = file_key.split('/')[-1].lower()
-
-                    # Usa read_csv para ler o conteúdo do arquivo
-                    if 'cliente' in file_name:
-                        df_clientes = pd.read_csv(io.BytesIO(response['Body'].read()))
-                        print("Arquivo de clientes lido com sucesso!")
-                    elif 'navegacao' in file_name:
-                        df_navegacao = pd.read_csv(io.BytesIO(response['Body'].read()))
-                        print("Arquivo de navegação lido com sucesso!")
-                    elif 'transacao' in file_name:
-                        df_transacao = pd.read_csv(io.BytesIO(response['Body'].read()))
-                        print("Arquivo de transações lido com sucesso!")
-
-                except Exception as e:
-                    print(f"Erro ao ler arquivo {file_key}: {str(e)}")
-                    continue
+        partes = [_ler_objeto(armazenamento.nome, entrada['Key'], entrada['ETag'], entrada['Size'])
+                  for entrada in (indice['arquivos']['estado'], indice['arquivos']['contagens'])]
+
+        return partes[0], partes[1], indice['fontes']
 
-        return df_clientes, df_navegacao, df_transacao
+    except FileNotFoundError:
+        print(f"Estado das métricas dos itens não encontrado em {ESTADO_ITENS_PREFIXO}")
 
     except Exception as e:
-        print(f"Erro ao listar objetos do bucket: {str(e)}")
-        raise
+        print(f"Erro ao ler o estado das métricas dos itens: {str(e)}")
+
+    return None
+
+
+def atualizar_metricas_itens() -> None:
+    """
+    Atualiza o estado das estatísticas de preço dos itens com as transações novas e
+    regrava a partir dele a tabela de métricas dos itens (itens_metricas) da pasta output.
+
+    O estado guarda, por item, a quantidade, a média, o m2, o mínimo e o máximo dos preços,
+    além da quantidade de vendas de cada preço (para a moda exata), e o índice da pasta
+    registra os arquivos de transação já incorporados. Apenas os arquivos novos são lidos e
+    combinados ao estado, de modo que o custo acompanha o volume das transações novas; um
+    arquivo já incorporado que foi alterado ou removido faz o estado ser recalculado do zero.
+
+    A tabela gravada passa por limpeza_itens_metricas, como a gerada pela página de ETL. Uma
+    tabela itens_metricas já existente só é regravada se tiver as mesmas colunas da
+    calculada; caso contrário, nada é gravado e a rotina gera um erro.
+    """
+    armazenamento = get_armazenamento()
+    inicio = time.perf_counter()
+
+    fontes = _fontes_transacao()
+    etags_fontes = {obj['Key']: obj['ETag'] for obj in fontes}
+    anterior = _ler_estado_itens()
+
+    if anterior is not None and all(etags_fontes.get(key) == etag for key, etag in anterior[2].items()):
+        estado, contagens, incorporadas = anterior
+        novas = [obj for obj in fontes if obj['Key'] not in incorporadas]
+        if not novas:
+            print("itens_metricas: nenhuma transação nova desde a última atualização")
+            return
+
+        df_transacao = _ler_shards('transacao', novas, ('codigo_item', 'valor'))
+        estado, contagens = _combinar_estados_precos(estado, contagens, *_estado_precos_itens(df_transacao))
+        print(f"itens_metricas: {len(novas)} arquivos de transação novos incorporados ao estado")
+
+    else:
+        if anterior is not None:
+            print("itens_metricas: arquivos de transação alterados ou removidos, estado recalculado do zero")
+
+        # Lê exatamente os arquivos registrados no índice, e não a cópia compactada, que pode estar defasada
+        df_transacao = _ler_shards('transacao', fontes, ('codigo_item', 'valor'))
+        estado, contagens = _estado_precos_itens(df_transacao)
+
+    # O estado guarda todos os itens; a tabela gravada passa pelas mesmas limpezas do ETL,
+    # pois a página de feature engineering usa apenas os itens que restam nela
+    df_itens_metricas = limpeza_itens_metricas(_variacao_de_estatisticas(_estatisticas_do_estado(estado, contagens)))
+
+    # Mantém o nome da tabela de métricas já existente na pasta, se houver
+    shards, _ = _agrupar_objetos(_listar_objetos_paginado('output/'), ('.parquet',), TABELAS_PASTAS['output/'])
+    existentes = shards.get('itens_metricas', {}).get('.parquet', [])
+    destino = existentes[0]['Key'] if existentes else ITENS_METRICAS_KEY
+    if len(existentes) > 1:
+        print(f"Aviso: output/ possui {len(existentes)} arquivos de itens_metricas; apenas {destino} será regravado")
+
+    # Só regrava uma tabela existente com as mesmas colunas: a página de feature engineering
+    # faz o merge pelas colunas em comum, e uma tabela de outro formato seria perdida
+    if existentes:
+        colunas_existentes = _ler_objeto(
+            armazenamento.nome, existentes[0]['Key'], existentes[0]['ETag'], existentes[0]['Size']
+        ).columns
+        if set(colunas_existentes) != set(df_itens_metricas.columns):
+            raise ValueError(
+                f"{destino} tem colunas diferentes das calculadas ({', '.join(map(str, colunas_existentes))}); "
+                f"renomeie ou remova o arquivo antes de atualizar itens_metricas"
+            )
+
+    arquivos = {
+        'estado': (f'{ESTADO_ITENS_PREFIXO}estado.parquet', estado),
+        'contagens': (f'{ESTADO_ITENS_PREFIXO}contagens_precos.parquet', contagens),
+        'itens_metricas': (destino, df_itens_metricas),
+    }
+    for chave, df in arquivos.values():
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, engine='pyarrow', index=False, compression='zstd')
+        buffer.seek(0)
+        armazenamento.gravar(chave, buffer)
+
+    # O índice é gravado por último: um estado gravado pela metade não confere com os ETags registrados
+    gravados = {obj['Key']: obj for obj in armazenamento.listar(ESTADO_ITENS_PREFIXO)}
+    indice = {
+        'gerado_em': datetime.now().astimezone().isoformat(),
+        'fontes': etags_fontes,
+        'arquivos': {
+            nome: {'Key': chave, 'ETag': gravados[chave]['ETag'], 'Size': gravados[chave]['Size']}
+            for nome, (chave, _) in arquivos.items() if nome != 'itens_metricas'
+        },
+    }
+    armazenamento.gravar(ESTADO_ITENS_INDICE, json.dumps(indice, indent=2).encode('utf-8'))
+
+    # O manifesto da pasta, quando usado, precisa enxergar a nova versão da tabela
+    if any(obj['Key'] == f'output/{MANIFESTO_NOME}' for obj in armazenamento.listar('output/')):
+        gerar_manifesto('output/')
+
+    print(f"itens_metricas gravada em {destino} ({len(df_itens_metricas)} itens) "
+          f"em {time.perf_counter() - inicio:.1f} s")
 
 
 def converte_data_clientes(df_clientes: pd.DataFrame) -> pd.DataFrame:
@@ -184,17 +1933,22 @@ def converte_data_clientes(df_clientes: pd.DataFrame) -> pd.DataFrame:
     :param df_clientes: Dataframe com os dados dos clientes
     :return df_clientes: Dataframe com a coluna data_nascimento convertida para datetime
     """
-    # Conversão das datas
-    df_clientes['data_ultima_compra_renner'] = pd.to_datetime(df_clientes['data_ultima_compra_renner']).dt.date
-    df_clientes['data_primeira_compra_renner'] = pd.to_datetime(df_clientes['data_primeira_compra_renner']).dt.date
+    # Conversão das datas (as colunas já chegam como datetime pelo esquema da tabela); o
+    # horário é zerado e as colunas continuam datetime64, sem objetos date do Python
+    df_clientes['data_ultima_compra_renner'] = df_clientes['data_ultima_compra_renner'].dt.normalize()
+    df_clientes['data_primeira_compra_renner'] = df_clientes['data_primeira_compra_renner'].dt.normalize()
 
     return df_clientes
 
 
+@lru_cache(maxsize=65536)
 def limpar_nomes_cidades(cidade: str) -> str:
     """
     Limpa o nome da cidade, removendo acentos, caracteres especiais e espaços extras.
 
+    O resultado é memorizado por nome, de modo que cada grafia distinta é tratada
+    uma única vez por processo, mesmo entre leituras diferentes da tabela.
+
     :param cidade: Nome da cidade a ser limpo
     :return cidade_limpa: Nome da cidade limpo
     """
@@ -212,27 +1966,164 @@ def limpar_nomes_cidades(cidade: str) -> str:
     return cidade_limpa
 
 
-def aplicar_limpeza_cidades(df_clientes: pd.DataFrame) -> pd.DataFrame:
+# Lista oficial de municípios usada para corrigir nomes de cidades com erros de digitação
+# (arquivo texto com um município por linha); sem ela, os nomes são apenas limpos
+MUNICIPIOS_ARQUIVO = os.getenv('RENNER_MUNICIPIOS_ARQUIVO')
+
+# Parâmetros da correspondência aproximada com a lista de municípios
+MUNICIPIOS_TAMANHO_NGRAMA = 3
+MUNICIPIOS_MAX_CANDIDATOS = 10
+MUNICIPIOS_SIMILARIDADE_MINIMA = 0.85
+# Quantidade de nomes distintos cujas correspondências ficam guardadas em cada índice
+MUNICIPIOS_MAX_CACHE = 65536
+
+
+class IndiceMunicipios:
+    """
+    Índice invertido de n-gramas de caracteres de uma lista de municípios, usado para
+    encontrar o município correspondente a um nome de cidade escrito com erros.
+
+    Cada busca soma, pelas listas do índice, os n-gramas que o nome compartilha com
+    cada município e compara por similaridade de texto apenas os poucos mais próximos
+    (coeficiente de Dice dos n-gramas), em vez de percorrer a lista inteira. O resultado
+    dos últimos MUNICIPIOS_MAX_CACHE nomes distintos fica guardado para as próximas buscas.
+    """
+
+    def __init__(self, municipios: list[str]):
+        """
+        :param municipios: Nomes dos municípios, limpos com limpar_nomes_cidades antes de indexados
+        """
+        self.municipios = sorted({limpar_nomes_cidades(municipio) for municipio in municipios})
+        self.conjunto = set(self.municipios)
+
+        indice = defaultdict(list)
+        for posicao, municipio in enumerate(self.municipios):
+            for ngrama in self._ngramas(municipio):
+                indice[ngrama].append(posicao)
+        self.indice = {ngrama: np.array(posicoes, dtype=np.int32) for ngrama, posicoes in indice.items()}
+        self.qtd_ngramas = np.array([len(self._ngramas(municipio)) for municipio in self.municipios])
+
+        # Cache limitado por índice, descartando os nomes usados há mais tempo
+        self._buscar = lru_cache(maxsize=MUNICIPIOS_MAX_CACHE)(self._buscar)
+
+    @staticmethod
+    def _ngramas(nome: str) -> set[str]:
+        """
+        N-gramas de caracteres do nome, com espaços nas bordas para que o início e o
+        fim do nome também sejam considerados.
+        """
+        nome = f' {nome} '
+        return {nome[inicio:inicio + MUNICIPIOS_TAMANHO_NGRAMA]
+                for inicio in range(len(nome) - MUNICIPIOS_TAMANHO_NGRAMA + 1)}
+
+    def corresponder(self, cidade: str) -> str | None:
+        """
+        Encontra o município correspondente a um nome de cidade já limpo.
+
+        :param cidade: Nome da cidade limpo com limpar_nomes_cidades
+        :return municipio: Município correspondente, ou None se nenhum for parecido o suficiente
+        """
+        if cidade in self.conjunto:
+            return cidade
+
+        return self._buscar(cidade)
+
+    def _buscar(self, cidade: str) -> str | None:
+        """
+        Busca pelo índice o município mais parecido com um nome que não está na lista.
+
+        :param cidade: Nome da cidade limpo com limpar_nomes_cidades
+        :return municipio: Município correspondente, ou None se nenhum for parecido o suficiente
+        """
+        ngramas = self._ngramas(cidade)
+        listas = [self.indice[ngrama] for ngrama in ngramas if ngrama in self.indice]
+        if not listas:
+            return None
+
+        # Candidatos: municípios com maior proporção de n-gramas em comum com o nome
+        comuns = np.bincount(np.concatenate(listas), minlength=len(self.municipios))
+        dice = 2 * comuns / (len(ngramas) + self.qtd_ngramas)
+        qtd_candidatos = min(MUNICIPIOS_MAX_CANDIDATOS, len(self.municipios))
+        candidatos = np.argpartition(-dice, qtd_candidatos - 1)[:qtd_candidatos]
+
+        # O nome buscado fica fixo no comparador, que guarda o que já calculou sobre ele;
+        # os limites superiores rápidos descartam candidatos que não podem superar o melhor
+        comparador = difflib.SequenceMatcher(None)
+        comparador.set_seq2(cidade)
+        melhor, melhor_similaridade = None, 0.0
+        for posicao in candidatos[np.argsort(-dice[candidatos], kind='stable')]:
+            comparador.set_seq1(self.municipios[posicao])
+            if comparador.real_quick_ratio() <= melhor_similaridade or comparador.quick_ratio() <= melhor_similaridade:
+                continue
+            similaridade = comparador.ratio()
+            if similaridade > melhor_similaridade:
+                melhor, melhor_similaridade = self.municipios[posicao], similaridade
+
+        return melhor if melhor_similaridade >= MUNICIPIOS_SIMILARIDADE_MINIMA else None
+
+
+@lru_cache(maxsize=4)
+def _indice_municipios(municipios: tuple[str, ...]) -> IndiceMunicipios:
+    """
+    Monta o índice de uma lista de municípios uma única vez por processo.
+
+    :param municipios: Nomes dos municípios
+    :return indice: Índice de n-gramas dos municípios
+    """
+    return IndiceMunicipios(list(municipios))
+
+
+@lru_cache(maxsize=1)
+def carregar_municipios() -> tuple[str, ...] | None:
+    """
+    Lê a lista de municípios de MUNICIPIOS_ARQUIVO.
+
+    :return municipios: Nomes dos municípios, ou None se o arquivo não foi configurado
+    """
+    if not MUNICIPIOS_ARQUIVO:
+        return None
+
+    with open(MUNICIPIOS_ARQUIVO, encoding='utf-8') as arquivo:
+        return tuple(linha.strip() for linha in arquivo if linha.strip())
+
+
+def aplicar_limpeza_cidades(df_clientes: pd.DataFrame, municipios: list[str] | None = None) -> pd.DataFrame:
     """
     Aplica a limpeza de nomes de cidades no dataframe de clientes.
 
+    Com uma lista de municípios, cada nome limpo é substituído pelo município mais
+    parecido (ver IndiceMunicipios); nomes sem correspondência ficam apenas limpos.
+
     :param df_clientes: Dataframe com os dados dos clientes
+    :param municipios: Lista oficial de municípios; None usa a de MUNICIPIOS_ARQUIVO, se configurada
     :return df_clientes: Dataframe com a coluna cidade limpa
     """
-    # Aplicar a limpeza
-    df_clientes['cidade'] = df_clientes['cidade'].apply(limpar_nomes_cidades)
+    if municipios is None:
+        municipios = carregar_municipios()
+
+    # Aplicar a limpeza uma única vez por nome distinto e devolver o resultado às linhas pelos códigos
+    # (cidades ausentes recebem o código -1, que aponta para o NaN acrescentado ao final)
+    codigos, cidades_unicas = pd.factorize(df_clientes['cidade'])
+    cidades_limpas = [limpar_nomes_cidades(cidade) for cidade in cidades_unicas]
 
-    # Lista de todas as capitais brasileiras, incluindo o Distrito Federal, em maiúscula e sem acentuação
-    capitais = [
+    if municipios:
+        indice = _indice_municipios(tuple(municipios))
+        cidades_limpas = [indice.corresponder(cidade) or cidade for cidade in cidades_limpas]
+
+    cidades_limpas = pd.Index(cidades_limpas + [np.nan], dtype=object)
+    df_clientes['cidade'] = cidades_limpas.to_numpy()[codigos]
+
+    # Conjunto de todas as capitais brasileiras, incluindo o Distrito Federal, em maiúscula e sem acentuação
+    capitais = {
         'ARACAJU', 'BELEM', 'BELO HORIZONTE', 'BOA VISTA', 'BRASILIA', 'CAMPO GRANDE', 
         'CUIABA', 'CURITIBA', 'FLORIANOPOLIS', 'FORTALEZA', 'GOIANIA', 'JOAO PESSOA', 
         'MACAPA', 'MACEIO', 'MANAUS', 'NATAL', 'PALMAS', 'PORTO ALEGRE', 'PORTO VELHO', 
         'RECIFE', 'RIO BRANCO', 'RIO DE JANEIRO', 'SALVADOR', 'SAO LUIS', 'SAO PAULO', 
         'TERESINA', 'VITORIA'
-    ]
+    }
 
     # Adicionar coluna "capital" com a informação 1 quando Capital ou 0 quando outro
-    df_clientes['capital'] = df_clientes['cidade'].apply(lambda x: 1 if x in capitais else 0)
+    df_clientes['capital'] = cidades_limpas.isin(capitais).astype('int64')[codigos]
 
     # Mapear os valores 0 e 1 para "Interior" e "Capital"
     df_clientes['capital_label'] = df_clientes['capital'].map({1: 'Capital', 0: 'Interior'})
@@ -240,21 +2131,30 @@ def aplicar_limpeza_cidades(df_clientes: pd.DataFrame) -> pd.DataFrame:
     return df_clientes
 
 
-def grafico_capitais_interior(df_clientes: pd.DataFrame) -> go.Figure:
+def transformacoes_grafico_capitais(df_clientes: pd.DataFrame) -> pd.Series:
+    """
+    Faz as transformações necessárias para criar o gráfico de capitais e interior.
+
+    :param df_clientes: DataFrame contendo a coluna 'capital_label'
+    :return: Série com a contagem de clientes de capitais e do interior
+    """
+    return df_clientes['capital_label'].value_counts()
+
+
+def grafico_capitais_interior(contagem: pd.Series) -> go.Figure:
     """
     Cria um gráfico de barras interativo mostrando a distribuição de clientes
     entre capitais e interior.
 
-    :param df_clientes: DataFrame contendo a coluna 'capital_label'
+    :param contagem: Contagem de clientes por 'capital_label' (ver transformacoes_grafico_capitais)
     :return fig: Figura do Plotly pronta para ser exibida
     """
     def format_number(value):
         """Formata número para o padrão brasileiro sem depender do locale"""
         return f"{value:,}".replace(",", ".")
 
-    # Calcular as contagens e percentuais
-    contagem = df_clientes['capital_label'].value_counts()
-    percentuais = (contagem / len(df_clientes) * 100).round(1)
+    # Calcular os percentuais
+    percentuais = (contagem / contagem.sum() * 100).round(1)
 
     # Usar a função de formatação personalizada
     valores_formatados = [format_number(int(valor)) for valor in contagem.values]
@@ -494,18 +2394,29 @@ def criar_grafico_distribuicao_idades_negativas(df_clientes):
     return fig, total_negativos
 
 
-def criar_grafico_distribuicao_genero(df_clientes):
+def transformacoes_grafico_genero(df_clientes: pd.DataFrame) -> pd.Series:
+    """
+    Faz as transformações necessárias para criar o gráfico de gênero.
+
+    :param df_clientes: DataFrame contendo a coluna 'genero'
+    :return: Série com a contagem de clientes por gênero
+    """
+    # Colunas categóricas contam também as categorias sem nenhuma linha, que virariam barras vazias
+    return df_clientes['genero'].value_counts()[lambda contagem: contagem > 0]
+
+
+def criar_grafico_distribuicao_genero(contagem_genero):
    """
    Cria um gráfico de barras interativo mostrando a distribuição de gênero dos clientes.
    
    Args:
-       df_clientes (pd.DataFrame): DataFrame contendo a coluna 'genero'
+       contagem_genero (pd.Series): Contagem de clientes por gênero (ver transformacoes_grafico_genero)
        
    Returns:
        fig: Figura do Plotly pronta para ser exibida
    """
-   # Calcular a contagem de gêneros
-   contagem = df_clientes['genero'].value_counts().reset_index()
+   # Tabela com a contagem de gêneros
+   contagem = contagem_genero.reset_index()
    contagem.columns = ['genero', 'contagem']
    
    # Definir cores diferentes para cada gênero
@@ -583,10 +2494,7 @@ def criar_grafico_distribuicao_compras(df_clientes):
         fig: Figura do Plotly pronta para ser exibida
     """
     
-    # Converter datas para datetime se ainda não estiver nesse formato
-    df_clientes['data_ultima_compra_renner'] = pd.to_datetime(df_clientes['data_ultima_compra_renner'])
-    
-    # Contar o número de compras por data
+    # Contar o número de compras por data (a coluna já é datetime, ver converte_data_clientes)
     contagem_diaria = df_clientes['data_ultima_compra_renner'].value_counts().sort_index()
     
     # Criar o gráfico
@@ -671,11 +2579,8 @@ def criar_grafico_intervalo_compras(df_clientes):
     Returns:
         fig: Figura do Plotly pronta para ser exibida
     """
-    df_clientes['data_ultima_compra_renner'] = pd.to_datetime(df_clientes['data_ultima_compra_renner'])
-    df_clientes['data_primeira_compra_renner'] = pd.to_datetime(df_clientes['data_primeira_compra_renner'])
-
-    # Calcular o intervalo
-    df_clientes['intervalo_pri_ult_compra'] = pd.to_timedelta(
+    # Calcular o intervalo (as colunas já são datetime, ver converte_data_clientes)
+    df_clientes['intervalo_pri_ult_compra'] = (
         df_clientes['data_ultima_compra_renner'] - df_clientes['data_primeira_compra_renner']
     ).dt.days
 
@@ -871,24 +2776,30 @@ def criar_grafico_cidades_35_percent(cidades_35_percent_data, percentual_acumula
     return fig
 
 
-def criar_grafico_eventos_jornada(df_navegacao):
+def transformacoes_grafico_eventos(df_navegacao: pd.DataFrame) -> pd.Series:
+    """
+    Faz as transformações necessárias para criar o gráfico de eventos da jornada de compra.
+
+    :param df_navegacao: DataFrame contendo a coluna 'nome_evento'
+    :return: Série com a contagem de eventos por tipo
+    """
+    # Colunas categóricas contam também as categorias sem nenhuma linha, que virariam barras vazias
+    return df_navegacao['nome_evento'].value_counts()[lambda contagem: contagem > 0]
+
+
+def criar_grafico_eventos_jornada(contagem_eventos):
    """
    Cria um gráfico de barras mostrando a contagem de eventos por tipo na jornada de compra.
    
    Args:
-       df_navegacao: DataFrame contendo as colunas 'data_evento' e 'nome_evento'
+       contagem_eventos: Contagem de eventos por 'nome_evento' (ver transformacoes_grafico_eventos)
        
    Returns:
        fig: Figura do Plotly pronta para ser exibida
    """
-   # Converter a data para datetime
-   df_navegacao['data_evento'] = pd.to_datetime(df_navegacao['data_evento'])
-   
    # Ordem lógica dos eventos
    ordem_eventos = ['view_item', 'select_item', 'add_to_wishlist', 'add_to_cart', 'purchase']
    
-   # Calcular contagem de eventos
-   contagem_eventos = df_navegacao['nome_evento'].value_counts()
    # Reordenar conforme a ordem lógica
    contagem_eventos = contagem_eventos.reindex(ordem_eventos)
    
@@ -960,18 +2871,29 @@ def criar_grafico_eventos_jornada(df_navegacao):
    return fig
 
 
-def criar_grafico_tipo_venda(df_transacao):
+def transformacoes_grafico_tipo_venda(df_transacao: pd.DataFrame) -> pd.Series:
+    """
+    Faz as transformações necessárias para criar o gráfico de tipos de venda.
+
+    :param df_transacao: DataFrame contendo a coluna 'tipo_venda'
+    :return: Série com a contagem de vendas por tipo
+    """
+    # Colunas categóricas contam também as categorias sem nenhuma linha, que virariam barras vazias
+    return df_transacao['tipo_venda'].value_counts()[lambda contagem: contagem > 0]
+
+
+def criar_grafico_tipo_venda(contagem_vendas):
    """
    Cria um gráfico de barras mostrando a distribuição dos tipos de venda.
    
    Args:
-       df_transacao: DataFrame contendo a coluna 'tipo_venda'
+       contagem_vendas: Contagem de vendas por 'tipo_venda' (ver transformacoes_grafico_tipo_venda)
        
    Returns:
        fig: Figura do Plotly pronta para ser exibida
    """
-   # Calcular contagem de tipos de venda e ordenar
-   contagem_vendas = df_transacao['tipo_venda'].value_counts().reindex(['ON', 'OFF'])
+   # Ordenar a contagem de tipos de venda
+   contagem_vendas = contagem_vendas.reindex(['ON', 'OFF'])
    
    # Criar o gráfico
    fig = go.Figure()
@@ -1045,6 +2967,74 @@ def criar_grafico_tipo_venda(df_transacao):
    return fig
 
 
+# Quantidade máxima de outliers de cada caixa enviados ao navegador
+BOXPLOT_MAX_OUTLIERS = 1000
+
+
+def transformacoes_grafico_boxplot(df: pd.DataFrame, coluna_grupo: str, coluna_valor: str = 'valor',
+                                   max_outliers: int = BOXPLOT_MAX_OUTLIERS) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Calcula no servidor as estatísticas dos boxplots de cada grupo, para que o gráfico
+    não precise receber todos os valores.
+
+    Os quartis usam interpolação linear (o quartilemethod padrão do Plotly) e os bigodes
+    seguem a regra de Tukey: vão até o valor mais extremo dentro de 1,5 IQR das bordas da
+    caixa; os valores além deles são os outliers. Quando um grupo tem mais de max_outliers
+    outliers, é enviada uma amostra igualmente espaçada dos valores ordenados, que mantém
+    o menor e o maior.
+
+    :param df: DataFrame com as colunas do grupo e do valor
+    :param coluna_grupo: Coluna que define as caixas
+    :param coluna_valor: Coluna numérica
+    :param max_outliers: Quantidade máxima de outliers por grupo
+    :return estatisticas: DataFrame com uma linha por grupo com valores, em ordem de grupo, e as
+        colunas q1, mediana, q3, limite_inferior e limite_superior (extremos dos bigodes)
+    :return outliers: DataFrame com as colunas do grupo e do valor dos outliers amostrados
+    """
+    estatisticas = _estatisticas_por_grupo(df, coluna_grupo, coluna_valor, (0.25, 0.5, 0.75))
+    q1 = estatisticas['quantil_0.25'].to_numpy()
+    q3 = estatisticas['quantil_0.75'].to_numpy()
+    iqr = q3 - q1
+
+    # Mesmos códigos de grupo de _estatisticas_por_grupo (factorize ordenado)
+    codigos, _ = pd.factorize(df[coluna_grupo], sort=True)
+    valores = df[coluna_valor].to_numpy(dtype='float64')
+    validos = (codigos >= 0) & ~np.isnan(valores)
+    codigos, valores = codigos[validos], valores[validos]
+
+    dentro = (valores >= (q1 - 1.5 * iqr)[codigos]) & (valores <= (q3 + 1.5 * iqr)[codigos])
+    bigodes = (pd.Series(valores[dentro]).groupby(codigos[dentro]).agg(['min', 'max'])
+               .reindex(range(len(estatisticas))))
+
+    # Outliers ordenados por grupo e valor; de cada grupo com mais de max_outliers fica o
+    # primeiro outlier de cada uma de max_outliers faixas iguais de posições
+    fora = np.flatnonzero(~dentro)
+    fora = fora[np.lexsort((valores[fora], codigos[fora]))]
+    codigos_fora = codigos[fora]
+    qtd_fora = np.bincount(codigos_fora, minlength=len(estatisticas))[codigos_fora]
+    posicao = np.arange(len(fora)) - np.searchsorted(codigos_fora, codigos_fora)
+    grandes = qtd_fora > max_outliers
+    faixa = (posicao * (max_outliers - 1)) // np.where(grandes, qtd_fora - 1, 1)
+    faixa_anterior = ((posicao - 1) * (max_outliers - 1)) // np.where(grandes, qtd_fora - 1, 1)
+    fora = fora[~grandes | (faixa != faixa_anterior)]
+
+    outliers = pd.DataFrame({
+        coluna_grupo: estatisticas[coluna_grupo].to_numpy()[codigos[fora]],
+        coluna_valor: valores[fora],
+    })
+
+    estatisticas = pd.DataFrame({
+        coluna_grupo: estatisticas[coluna_grupo],
+        'q1': q1,
+        'mediana': estatisticas['quantil_0.5'],
+        'q3': q3,
+        'limite_inferior': bigodes['min'].to_numpy(),
+        'limite_superior': bigodes['max'].to_numpy(),
+    }).loc[estatisticas['qtd'] > 0].reset_index(drop=True)
+
+    return estatisticas, outliers
+
+
 def criar_grafico_boxplot_divisao(df_transacao):
     """
     Cria um boxplot mostrando a distribuição dos valores por divisão.
@@ -1055,25 +3045,38 @@ def criar_grafico_boxplot_divisao(df_transacao):
     Returns:
         fig: Figura do Plotly pronta para ser exibida
     """
+    # Estatísticas das caixas e amostra dos outliers calculadas no servidor
+    estatisticas, outliers = transformacoes_grafico_boxplot(df_transacao, 'nome_divisao')
+
     # Criar o gráfico
     fig = go.Figure()
     
-    # Adicionar os boxplots para cada divisão
-    for divisao in df_transacao['nome_divisao'].unique():
-        fig.add_trace(go.Box(
-            y=df_transacao[df_transacao['nome_divisao'] == divisao]['valor'],
-            name=divisao,
-            fillcolor='red',  # cor do preenchimento
-            boxpoints='outliers',  # mostrar outliers
-            line=dict(color='black', width=1),  # cor da borda do boxplot
-            marker=dict(
-                color='black',  # cor dos outliers
-                size=3,  # tamanho menor dos outliers
-                outliercolor='black'  # cor dos outliers
-            ),
-            hoverinfo='skip',  # desabilita hover nos outliers
-            hoveron='boxes'  # hover apenas nas caixas
-        ))
+    # Adicionar os boxplots de todas as divisões
+    fig.add_trace(go.Box(
+        x=estatisticas['nome_divisao'],
+        q1=estatisticas['q1'],
+        median=estatisticas['mediana'],
+        q3=estatisticas['q3'],
+        lowerfence=estatisticas['limite_inferior'],
+        upperfence=estatisticas['limite_superior'],
+        fillcolor='red',  # cor do preenchimento
+        boxpoints=False,  # outliers adicionados abaixo
+        line=dict(color='black', width=1),  # cor da borda do boxplot
+        hoverinfo='skip',  # desabilita hover nos outliers
+        hoveron='boxes'  # hover apenas nas caixas
+    ))
+
+    # Adicionar os outliers de cada divisão
+    fig.add_trace(go.Scatter(
+        x=outliers['nome_divisao'],
+        y=outliers['valor'],
+        mode='markers',
+        marker=dict(
+            color='black',  # cor dos outliers
+            size=3  # tamanho menor dos outliers
+        ),
+        hoverinfo='skip'
+    ))
     
     # Personalizar o layout
     fig.update_layout(
@@ -1320,22 +3323,24 @@ def plot_item_boxplot(df_transacao, codigo_item):
     Returns:
         fig: Figura do Plotly pronta para ser exibida
     """
-    # Filtrar dados para o item específico
-    df_item = df_transacao.loc[df_transacao['codigo_item'] == codigo_item]
+    # Filtrar dados para o item específico e calcular as estatísticas da caixa no servidor
+    df_item = df_transacao.loc[df_transacao['codigo_item'] == codigo_item, ['codigo_item', 'valor']]
+    estatisticas, outliers = transformacoes_grafico_boxplot(df_item, 'codigo_item')
+    nome = f'Item {codigo_item}'
     
     # Criar figura
     fig = go.Figure()
     
     # Adicionar boxplot
     fig.add_trace(go.Box(
-        y=df_item['valor'],
-        name=f'Item {codigo_item}',
-        boxpoints='outliers',  # Mostrar apenas outliers
-        marker=dict(
-            color='black',  # Cor dos outliers
-            size=4,  # Tamanho dos outliers
-            opacity=0.7
-        ),
+        x=[nome] * len(estatisticas),
+        q1=estatisticas['q1'],
+        median=estatisticas['mediana'],
+        q3=estatisticas['q3'],
+        lowerfence=estatisticas['limite_inferior'],
+        upperfence=estatisticas['limite_superior'],
+        name=nome,
+        boxpoints=False,  # Outliers adicionados abaixo
         line=dict(
             color='black',  # Cor das linhas do boxplot
             width=1  # Espessura das linhas
@@ -1343,6 +3348,19 @@ def plot_item_boxplot(df_transacao, codigo_item):
         fillcolor='red',  # Cor de preenchimento da caixa
         showlegend=False
     ))
+
+    # Adicionar apenas os outliers
+    fig.add_trace(go.Scatter(
+        x=[nome] * len(outliers),
+        y=outliers['valor'],
+        mode='markers',
+        marker=dict(
+            color='black',  # Cor dos outliers
+            size=4,  # Tamanho dos outliers
+            opacity=0.7
+        ),
+        showlegend=False
+    ))
     
     # Atualizar layout
     fig.update_layout(
@@ -1386,6 +3404,87 @@ def plot_item_boxplot(df_transacao, codigo_item):
     return fig
 
 
+def _estatisticas_por_grupo(df: pd.DataFrame, coluna_grupo: str, coluna_valor: str,
+                            quantis: tuple[float, ...] = ()) -> pd.DataFrame:
+    """
+    Calcula as estatísticas de uma coluna numérica por grupo com uma única ordenação.
+
+    As linhas são ordenadas por (grupo, valor); cada grupo passa a ser um trecho contínuo
+    do array, de onde saem a contagem, a soma e a soma dos quadrados (reduceat), o mínimo
+    e o máximo (extremos do trecho), os quantis (posições dentro do trecho) e a moda (a
+    maior sequência de valores iguais). Equivale ao groupby do pandas com mean, min, max,
+    std (ddof=1), count, Series.mode()[0] (o menor valor mais frequente) e quantile
+    (interpolação linear), sem chamar uma função Python por grupo.
+
+    :param df: DataFrame com as colunas do grupo e do valor
+    :param coluna_grupo: Coluna que define os grupos (linhas sem grupo são ignoradas)
+    :param coluna_valor: Coluna numérica (valores ausentes são ignorados, como no pandas)
+    :param quantis: Quantis a calcular, entre 0 e 1; cada um gera a coluna quantil_<q>
+    :return estatisticas: DataFrame com uma linha por grupo, em ordem crescente de grupo, e as
+        colunas qtd, media, minimo, maximo, desvio_padrao, moda e quantil_<q>
+    """
+    codigos, grupos = pd.factorize(df[coluna_grupo], sort=True)
+    valores = df[coluna_valor].to_numpy(dtype='float64')
+
+    validos = (codigos >= 0) & ~np.isnan(valores)
+    codigos, valores = codigos[validos], valores[validos]
+
+    # Ordena pelo valor e depois, de forma estável, pelo grupo; com até 65.536 grupos os
+    # códigos cabem em 16 bits e o numpy faz essa segunda ordenação com radix sort
+    ordem = np.argsort(valores)
+    tipo_codigos = np.uint16 if len(grupos) <= np.iinfo(np.uint16).max + 1 else np.int64
+    ordem = ordem[np.argsort(codigos[ordem].astype(tipo_codigos), kind='stable')]
+    codigos, valores = codigos[ordem], valores[ordem]
+
+    # Colunas de todos os grupos; os que não têm valores ficam com qtd 0 e NaN, como no pandas
+    qtd_grupos = len(grupos)
+    estatisticas = {'qtd': np.zeros(qtd_grupos, dtype='int64')}
+    for coluna in ['media', 'minimo', 'maximo', 'desvio_padrao', 'moda'] + [f'quantil_{q:g}' for q in quantis]:
+        estatisticas[coluna] = np.full(qtd_grupos, np.nan)
+
+    if len(valores) > 0:
+        # Início de cada grupo no array ordenado
+        novo_grupo = np.r_[True, codigos[1:] != codigos[:-1]]
+        inicios = np.flatnonzero(novo_grupo)
+        qtd = np.diff(np.r_[inicios, len(valores)])
+        fins = inicios + qtd - 1
+        presentes = codigos[inicios]
+
+        media = np.add.reduceat(valores, inicios) / qtd
+        soma_quadrados = np.add.reduceat((valores - np.repeat(media, qtd)) ** 2, inicios)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            desvio_padrao = np.where(qtd > 1, np.sqrt(soma_quadrados / (qtd - 1)), np.nan)
+
+        estatisticas['qtd'][presentes] = qtd
+        estatisticas['media'][presentes] = media
+        estatisticas['minimo'][presentes] = valores[inicios]
+        estatisticas['maximo'][presentes] = valores[fins]
+        estatisticas['desvio_padrao'][presentes] = desvio_padrao
+
+        for q in quantis:
+            posicao = q * (qtd - 1)
+            abaixo = np.floor(posicao).astype('int64')
+            acima = np.minimum(abaixo + 1, qtd - 1)
+            valor_abaixo = valores[inicios + abaixo]
+            estatisticas[f'quantil_{q:g}'][presentes] = (
+                valor_abaixo + (valores[inicios + acima] - valor_abaixo) * (posicao - abaixo)
+            )
+
+        # Moda: a sequência de valores iguais mais longa de cada grupo; no empate, a
+        # primeira (menor valor), que é a que Series.mode()[0] devolve
+        inicios_sequencias = np.flatnonzero(novo_grupo | np.r_[True, valores[1:] != valores[:-1]])
+        tamanhos_sequencias = np.diff(np.r_[inicios_sequencias, len(valores)])
+        grupo_sequencias = np.cumsum(novo_grupo)[inicios_sequencias] - 1
+        maior_sequencia = np.maximum.reduceat(
+            tamanhos_sequencias, np.flatnonzero(np.r_[True, grupo_sequencias[1:] != grupo_sequencias[:-1]])
+        )
+        mais_longas = np.flatnonzero(tamanhos_sequencias == maior_sequencia[grupo_sequencias])
+        _, primeiras = np.unique(grupo_sequencias[mais_longas], return_index=True)
+        estatisticas['moda'][presentes] = valores[inicios_sequencias[mais_longas[primeiras]]]
+
+    return pd.DataFrame({coluna_grupo: np.asarray(grupos), **estatisticas})
+
+
 def transformacoes_grafico_variacao(df_transacao: pd.DataFrame) -> pd.DataFrame:
     """
     Faz as transformações necessárias para criar o gráfico de variação de vendas.
@@ -1393,21 +3492,26 @@ def transformacoes_grafico_variacao(df_transacao: pd.DataFrame) -> pd.DataFrame:
     :param df_transacao: DataFrame com os dados das transações
     :return: DataFrame contendo a variação de vendas por mês
     """
-    # Definir a função para calcular a moda
-    def calcular_moda(serie):
-        # Usar pandas mode() que retorna uma Series, pegar o primeiro valor se existir
-        moda = serie.mode()
-        return moda[0] if len(moda) > 0 else np.nan
-
     # Calcular a variação de preço para cada item, quantidade vendida e moda do preço
-    df_variacao = df_transacao.groupby('codigo_item').agg(
-        preco_medio=('valor', 'mean'),
-        preco_min=('valor', 'min'),
-        preco_max=('valor', 'max'),
-        desvio_padrao=('valor', 'std'),
-        qtd_vendida=('valor', 'count'),  # Contagem de vendas (quantidade vendida)
-        moda_preco=('valor', calcular_moda)  # Usar a função de moda personalizada
-    ).reset_index()
+    return _variacao_de_estatisticas(_estatisticas_por_grupo(df_transacao, 'codigo_item', 'valor'))
+
+
+def _variacao_de_estatisticas(estatisticas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Monta a tabela de variação de preço dos itens a partir das estatísticas por item.
+
+    :param estatisticas: DataFrame de _estatisticas_por_grupo (ou _estatisticas_do_estado) por codigo_item
+    :return: DataFrame com a variação de preço, a amplitude e o coeficiente de variação de cada item
+    """
+    df_variacao = pd.DataFrame({
+        'codigo_item': estatisticas['codigo_item'],
+        'preco_medio': estatisticas['media'],
+        'preco_min': estatisticas['minimo'],
+        'preco_max': estatisticas['maximo'],
+        'desvio_padrao': estatisticas['desvio_padrao'],
+        'qtd_vendida': estatisticas['qtd'],  # Contagem de vendas (quantidade vendida)
+        'moda_preco': estatisticas['moda'],
+    })
 
     # Calcular a amplitude (range) e o coeficiente de variação (CV)
     df_variacao['amplitude'] = df_variacao['preco_max'] - df_variacao['preco_min']
@@ -1619,7 +3723,7 @@ def plot_purchase_interval(df_clientes: pd.DataFrame) -> go.Figure:
         df_clientes.loc[condicao, ['data_primeira_compra_renner', 'data_ultima_compra_renner']].values
 
     # Calculate interval
-    df_clientes['intervalo_pri_ult_compra'] = pd.to_timedelta(
+    df_clientes['intervalo_pri_ult_compra'] = (
         df_clientes['data_ultima_compra_renner'] - df_clientes['data_primeira_compra_renner']
     ).dt.days
 
@@ -1666,41 +3770,39 @@ def plot_purchase_interval(df_clientes: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def transformacoes_etl_heuristicas(df_transacao: pd.DataFrame) -> pd.DataFrame:
+def transformacoes_etl_heuristicas(df_transacao: pd.DataFrame, df_variacao: pd.DataFrame | None = None) -> pd.DataFrame:
     """
     Faz as transformações necessárias para criar o gráfico de distribuição de valores de venda.
 
+    As estatísticas de cada item não dependem dos demais, então a tabela é a mesma de
+    transformacoes_grafico_variacao sem o item 108799.
+
     :param df_transacao: DataFrame com os dados das transações
+    :param df_variacao: Tabela de transformacoes_grafico_variacao já calculada para as mesmas
+        transações; quando informada, é apenas filtrada, sem novo cálculo
     :return: DataFrame contendo os valores de venda
     """
-    df_transacao = df_transacao.loc[df_transacao['codigo_item']!= 108799]
+    if df_variacao is None:
+        df_variacao = transformacoes_grafico_variacao(df_transacao.loc[df_transacao['codigo_item'] != 108799])
 
-    # Definir a função para calcular a moda
-    def calcular_moda(serie):
-        # Usar pandas mode() que retorna uma Series, pegar o primeiro valor se existir
-        moda = serie.mode()
-        return moda[0] if len(moda) > 0 else np.nan
+    return df_variacao.loc[df_variacao['codigo_item'] != 108799]
 
-    # Calcular a variação de preço para cada item, quantidade vendida e moda do preço
-    df_variacao = df_transacao.groupby('codigo_item').agg(
-        preco_medio=('valor', 'mean'),
-        preco_min=('valor', 'min'),
-        preco_max=('valor', 'max'),
-        desvio_padrao=('valor', 'std'),
-        qtd_vendida=('valor', 'count'),  # Contagem de vendas (quantidade vendida)
-        moda_preco=('valor', calcular_moda)  # Usar a função de moda personalizada
-    ).reset_index()
 
-    # Calcular a amplitude (range) e o coeficiente de variação (CV)
-    df_variacao['amplitude'] = df_variacao['preco_max'] - df_variacao['preco_min']
-    df_variacao['cv'] = (df_variacao['desvio_padrao'] / df_variacao['preco_medio']) * 100
+def limpeza_itens_metricas(df_variacao: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica à tabela de variação de preços as limpezas da página de ETL, gerando a tabela itens_metricas.
 
-    df_variacao['cv'] = df_variacao['cv'].fillna(0)
-    df_variacao['desvio_padrao'] = df_variacao['desvio_padrao'].fillna(0)
+    Descarta o item 108799 (transformacoes_etl_heuristicas), os itens com preço moda inferior
+    a R$ 1,00 (plot_variation_coefficient) e os itens com desvio padrão igual ou maior que 1,5
+    (plot_filtered_variation_coefficient_restrictive).
 
-    df_variacao = df_variacao.sort_values(by='amplitude', ascending=False)
+    :param df_variacao: Tabela de transformacoes_grafico_variacao
+    :return: DataFrame com os itens que permanecem após a limpeza
+    """
+    df_itens = transformacoes_etl_heuristicas(None, df_variacao)
+    df_itens = df_itens.loc[df_itens['moda_preco'] >= 1]
 
-    return df_variacao
+    return df_itens.loc[df_itens['desvio_padrao'] < 1.5].reset_index(drop=True)
 
 
 def plot_variation_coefficient(df_variacao: pd.DataFrame) -> tuple[go.Figure, pd.DataFrame]:
@@ -1909,125 +4011,54 @@ def plot_filtered_variation_coefficient_restrictive(df_variacao_m1: pd.DataFrame
     return fig
 
 
-def read_csv_files_fe() -> tuple[pd.DataFrame, pd.DataFrame]:
+def read_csv_files_fe(requisitos: dict[str, list[str] | None] | None = None,
+                      filtros: dict[str, list[tuple]] | None = None,
+                      periodo: tuple | None = None, listagem: dict | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
     Lê os arquivos CSV específicos da pasta input do bucket
     e retorna dois dataframes: navegacao e transacao.
-
+    Todos os arquivos de cada tabela (por exemplo, transacao_*.csv) são lidos como shards
+    e concatenados. Quando existe a cópia parquet gerada por compactar_entradas_parquet,
+    ela é lida no lugar dos shards já compactados.
+
+    :param requisitos: Tabelas e colunas usadas pela página ({tabela: colunas}); None lê tudo
+    :param filtros: Condições de cada tabela ({tabela: [(coluna, operador, valor), ...]}); None lê todas as linhas
+    :param periodo: Datas inicial e final (inclusivas) das transações; None lê todo o histórico
+    :param listagem: Listagem da pasta input já feita pela página (ver listar_entradas); None lista a pasta
     :return df_navegacao: Dataframe com os dados de navegação
     :return df_transacao: Dataframe com os dados de transações
     """
-    # Configurações do bucket
-    bucket_name = 'bkt-dev-projcdia-rennerrethink-streamlit'
-    input_prefix = 'input/'
-
-    # Obtém o cliente S3
-    s3_client = get_s3_client()
-
-    # Inicializa os dataframes
-    df_navegacao = pd.DataFrame()
-    df_transacao = pd.DataFrame()
-
-    try:
-        # Lista todos os objetos na pasta input
-        response = s3_client.list_objects_v2(
-            Bucket=bucket_name,
-            Prefix=input_prefix
-        )
-
-        # Verifica se existem objetos
-        if 'Contents' not in response:
-            print(f"Nenhum arquivo encontrado em {input_prefix}")
-            return df_navegacao, df_transacao
-
-        # Para cada arquivo na pasta input
-        for obj in response['Contents']:
-            file_key = obj['Key']
-
-            # Verifica se é um arquivo CSV
-            if file_key.endswith('.csv'):
-                try:
-                    # Lê o arquivo CSV
-                    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-                    file_name = file_key.split('/')[-1].lower()
-
-                    if 'navegacao' in file_name:
-                        df_navegacao = pd.read_csv(io.BytesIO(response['Body'].read()))
-                        print("Arquivo de navegação lido com sucesso!")
-                    elif 'transacao' in file_name:
-                        df_transacao = pd.read_csv(io.BytesIO(response['Body'].read()))
-                        print("Arquivo de transações lido com sucesso!")
-
-                except Exception as e:
-                    print(f"Erro ao ler arquivo {file_key}: {str(e)}")
-                    continue
-
-        return df_navegacao, df_transacao
+    dfs = _ler_arquivos_bucket(
+        'input/', ('.parquet', '.csv'),
+        {tabela: TABELAS_PASTAS['input/'][tabela] for tabela in ('navegacao', 'transacao')},
+        requisitos,
+        filtros,
+        periodo,
+        listagem
+    )
 
-    except Exception as e:
-        print(f"Erro ao listar objetos do bucket: {str(e)}")
-        raise
+    return dfs['navegacao'], dfs['transacao']
 
 
-def read_parquet_files_fe() -> tuple[pd.DataFrame, pd.DataFrame]:
+def read_parquet_files_fe(requisitos: dict[str, list[str] | None] | None = None,
+                          filtros: dict[str, list[tuple]] | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
-    Lê os arquivos parquet específicos da pasta input do bucket
+    Lê os arquivos parquet específicos da pasta output do bucket
     e retorna dois dataframes: clientes e métricas dos itens.
 
+    :param requisitos: Tabelas e colunas usadas pela página ({tabela: colunas}); None lê tudo
+    :param filtros: Condições de cada tabela ({tabela: [(coluna, operador, valor), ...]}); None lê todas as linhas
     :return df_clientes: Dataframe com os dados dos clientes
     :return df_itens_metricas: Dataframe com os dados de métricas dos itens
     """
-    # Configurações do bucket
-    bucket_name = 'bkt-dev-projcdia-rennerrethink-streamlit'
-    input_prefix = 'output/'
-
-    # Obtém o cliente S3
-    s3_client = get_s3_client()
-
-    # Inicializa os dataframes
-    df_clientes = pd.DataFrame()
-    df_itens_metricas = pd.DataFrame()
-
-    try:
-        # Lista todos os objetos na pasta input
-        response = s3_client.list_objects_v2(
-            Bucket=bucket_name,
-            Prefix=input_prefix
-        )
-
-        # Verifica se existem objetos
-        if 'Contents' not in response:
-            print(f"Nenhum arquivo encontrado em {input_prefix}")
-
-            return df_clientes, df_itens_metricas
-
-        # Para cada arquivo na pasta input
-        for obj in response['Contents']:
-            file_key = obj['Key']
-
-            # Verifica se é um arquivo parquet
-            if file_key.endswith('.parquet'):
-                try:
-                    # Lê o arquivo parquet
-                    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-                    file_name = file_key.split('/')[-1].lower()
-
-                    if 'cliente' in file_name:
-                        df_clientes = pd.read_parquet(io.BytesIO(response['Body'].read()))
-                        print("Arquivo de clientes lido com sucesso!")
-                    elif 'itens' in file_name:
-                        df_itens_metricas = pd.read_parquet(io.BytesIO(response['Body'].read()))
-                        print("Arquivo de itens lido com sucesso!")
-
-                except Exception as e:
-                    print(f"Erro ao ler arquivo {file_key}: {str(e)}")
-                    continue
-
-        return df_clientes, df_itens_metricas
+    dfs = _ler_arquivos_bucket(
+        'output/', ('.parquet',),
+        TABELAS_PASTAS['output/'],
+        requisitos,
+        filtros
+    )
 
-    except Exception as e:
-        print(f"Erro ao listar objetos do bucket: {str(e)}")
-        raise
+    return dfs['clientes'], dfs['itens_metricas']
 
 
 def transform_sales_dates_fe(df_cliente_transacao: pd.DataFrame) -> pd.DataFrame:
@@ -2037,14 +4068,15 @@ def transform_sales_dates_fe(df_cliente_transacao: pd.DataFrame) -> pd.DataFrame
     :param df_cliente_transacao: DataFrame containing sales data
     :return: DataFrame with added date-related columns
     """
-    # Create a copy to avoid modifying the original
-    df_cliente_transacao = df_cliente_transacao.copy()
+    # Shallow copy: with copy-on-write the original is never modified
+    df_cliente_transacao = df_cliente_transacao.copy(deep=False)
 
-    # Convert to datetime and extract date
-    df_cliente_transacao['data_venda'] = pd.to_datetime(df_cliente_transacao['data_venda']).dt.date
+    # Keep only the date, still as datetime64 (the column is already datetime from the table schema)
+    df_cliente_transacao['data_venda'] = df_cliente_transacao['data_venda'].dt.normalize()
 
-    # Add weekday information (0 = Monday)
-    df_cliente_transacao['dia_compra'] = df_cliente_transacao['data_venda'].apply(datetime.weekday)
+    # Add weekday information (0 = Monday); rows without a date (NaT) get NaN, as before
+    dia_compra = df_cliente_transacao['data_venda'].dt.weekday
+    df_cliente_transacao['dia_compra'] = dia_compra.astype('int64') if dia_compra.notna().all() else dia_compra
 
     # Add weekend flag (1 for Saturday/Sunday, 0 otherwise)
     df_cliente_transacao['fds'] = np.where(df_cliente_transacao['dia_compra'].isin([5, 6]), 1, 0)
@@ -2151,41 +4183,70 @@ def process_customer_metrics_fe(df: pd.DataFrame) -> pd.DataFrame:
     :param df: DataFrame containing customer transaction data
     :return: DataFrame with calculated customer metrics
     """
-    # Create a copy to avoid modifying original
-    df = df.copy()
+    # Shallow copy: with copy-on-write the original is never modified
+    df = df.copy(deep=False)
     
-    # Converter 'data_venda' para datetime e ordenar por cliente e data de venda
-    df['data_venda'] = pd.to_datetime(df['data_venda'])
+    # Ordenar por cliente e data de venda (já datetime, ver transform_sales_dates_fe)
     df = df.sort_values(by=['id_cliente', 'data_venda'])
     
     # Calcular intervalo de dias entre cada compra do cliente e preencher valores nulos com 0
     df['intervalo_compra'] = df.groupby('id_cliente')['data_venda'].diff().dt.days
-    df['intervalo_compra'].fillna(0, inplace=True)
-    
-    # Create division dummy variables
-    divisoes_encoded = pd.get_dummies(df['nome_divisao'])
-    divisoes_encoded['id_cliente'] = df['id_cliente']
-    divisoes_por_cliente = divisoes_encoded.groupby('id_cliente').sum().reset_index()
+    df['intervalo_compra'] = df['intervalo_compra'].fillna(0)
     
     # Calculate customer metrics
     df_metricas_cliente = df.groupby("id_cliente").agg(
         qtd_compras=('valor', 'size'),
         fds=('fds', 'sum'),
-        dia_preferido=('dia_compra', lambda x: x.mode()[0]),
-        compras_ON=('tipo_venda', lambda x: (x == 'ON').sum()),
-        compras_OFF=('tipo_venda', lambda x: (x == 'OFF').sum()),
         ticket_medio=('valor', 'mean'),
         total_gasto=('valor', 'sum'),
-        produtos_diferentes=('codigo_item', pd.Series.nunique),
+        produtos_diferentes=('codigo_item', 'nunique'),
         intervalo_medio=('intervalo_compra', 'mean')
     ).reset_index()
-    
-    # Merge metrics with divisions
-    df_metricas_cliente = pd.merge(
-        df_metricas_cliente, 
-        divisoes_por_cliente, 
-        on='id_cliente', 
-        how='left'
+
+    # Contagens por cliente com bincount sobre os códigos do cliente, na mesma ordem do groupby
+    codigos_cliente, clientes = pd.factorize(df['id_cliente'], sort=True)
+    qtd_clientes = len(clientes)
+
+    # Dia preferido: argmax da contagem de compras por dia; o primeiro máximo é o menor
+    # dia entre os mais frequentes, o mesmo que x.mode()[0]. Compras sem dia (código -1)
+    # ficam fora da contagem, como no mode, que ignora os nulos
+    codigos_dia, dias = pd.factorize(df['dia_compra'], sort=True)
+    com_dia = codigos_dia >= 0
+    contagem_dias = np.bincount(
+        codigos_cliente[com_dia] * len(dias) + codigos_dia[com_dia], minlength=qtd_clientes * len(dias)
+    ).reshape(qtd_clientes, len(dias))
+    if contagem_dias.size:
+        dia_preferido = dias.to_numpy()[contagem_dias.argmax(axis=1)]
+    else:
+        dia_preferido = np.full(qtd_clientes, np.nan)
+
+    # Clientes sem nenhuma compra com dia conhecido ficam sem dia preferido
+    sem_dia = ~contagem_dias.any(axis=1)
+    if sem_dia.any():
+        dia_preferido = np.where(sem_dia, np.nan, dia_preferido)
+    df_metricas_cliente.insert(3, 'dia_preferido', dia_preferido)
+
+    tipo_venda = df['tipo_venda']
+    for posicao, tipo in enumerate(['ON', 'OFF'], start=4):
+        compras = np.bincount(codigos_cliente[(tipo_venda == tipo).to_numpy()], minlength=qtd_clientes)
+        df_metricas_cliente.insert(posicao, f'compras_{tipo}', compras)
+
+    # Compras por divisão: matriz clientes x divisões montada direto dos códigos da
+    # categoria, sem o one-hot do tamanho da tabela de transações (pd.get_dummies)
+    divisao = df['nome_divisao']
+    if isinstance(divisao.dtype, pd.CategoricalDtype):
+        codigos_divisao, divisoes = divisao.cat.codes.to_numpy(), divisao.cat.categories
+    else:
+        codigos_divisao, divisoes = pd.factorize(divisao, sort=True)
+
+    com_divisao = codigos_divisao >= 0
+    contagem_divisoes = np.bincount(
+        codigos_cliente[com_divisao] * len(divisoes) + codigos_divisao[com_divisao],
+        minlength=qtd_clientes * len(divisoes)
+    ).reshape(qtd_clientes, len(divisoes))
+
+    df_metricas_cliente = pd.concat(
+        [df_metricas_cliente, pd.DataFrame(contagem_divisoes, columns=divisoes.to_numpy())], axis=1
     )
     
     return df_metricas_cliente
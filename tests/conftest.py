@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do app ficam na raiz do repositório, sem pacote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import st_renner_libs  # noqa: E402
+
+
+@pytest.fixture
+def armazenamento_local(tmp_path, monkeypatch):
+    """Armazenamento local em um diretório temporário, no lugar do bucket."""
+    monkeypatch.setattr(st_renner_libs, 'ARMAZENAMENTO_TIPO', 'local')
+    monkeypatch.setattr(st_renner_libs, 'ARMAZENAMENTO_DIR', str(tmp_path))
+    st_renner_libs.get_armazenamento.clear()
+
+    yield st_renner_libs.get_armazenamento()
+
+    st_renner_libs.get_armazenamento.clear()
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from st_renner_libs import _estatisticas_por_grupo, transformacoes_grafico_boxplot
+
+
+def boxplot_pandas(df: pd.DataFrame, coluna_grupo: str, coluna_valor: str = 'valor'
+                   ) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Estatísticas de Tukey de cada caixa calculadas grupo a grupo com o pandas."""
+    linhas, outliers = [], []
+    for grupo, valores in df.dropna(subset=[coluna_valor]).groupby(coluna_grupo)[coluna_valor]:
+        q1, mediana, q3 = valores.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        dentro = valores[(valores >= q1 - 1.5 * iqr) & (valores <= q3 + 1.5 * iqr)]
+        linhas.append({coluna_grupo: grupo, 'q1': q1, 'mediana': mediana, 'q3': q3,
+                       'limite_inferior': dentro.min(), 'limite_superior': dentro.max()})
+        fora = np.sort(valores[~valores.index.isin(dentro.index)].to_numpy())
+        outliers.append(pd.DataFrame({coluna_grupo: [grupo] * len(fora), coluna_valor: fora}))
+
+    colunas = [coluna_grupo, 'q1', 'mediana', 'q3', 'limite_inferior', 'limite_superior']
+    estatisticas = pd.DataFrame(linhas, columns=colunas)
+    outliers = pd.concat(outliers, ignore_index=True) if outliers else pd.DataFrame(columns=[coluna_grupo, coluna_valor])
+
+    return estatisticas, outliers
+
+
+def comparar(df: pd.DataFrame) -> None:
+    estatisticas, outliers = transformacoes_grafico_boxplot(df, 'grupo')
+    estatisticas_esperadas, outliers_esperados = boxplot_pandas(df, 'grupo')
+
+    pd.testing.assert_frame_equal(estatisticas, estatisticas_esperadas, check_dtype=False, rtol=1e-12)
+    pd.testing.assert_frame_equal(outliers, outliers_esperados, check_dtype=False)
+
+
+CASOS = {
+    'vazio': pd.DataFrame({'grupo': pd.Series([], dtype='object'), 'valor': pd.Series([], dtype='float64')}),
+    'um_grupo': pd.DataFrame({'grupo': ['a'] * 9, 'valor': [1.0, 2.0, 2.0, 3.0, 3.0, 3.0, 4.0, 5.0, 40.0]}),
+    'um_valor': pd.DataFrame({'grupo': ['a'], 'valor': [7.0]}),
+    # Quase todos os valores iguais: IQR zero, e todo valor diferente é outlier
+    'empates': pd.DataFrame({'grupo': ['a'] * 8 + ['b'] * 3, 'valor': [5.0] * 6 + [4.0, 9.0] + [1.0, 1.0, 1.0]}),
+    'com_nan': pd.DataFrame({'grupo': ['a', 'a', 'a', None, 'b', 'b', 'c'],
+                             'valor': [1.0, np.nan, 3.0, 100.0, np.nan, np.nan, 2.0]}),
+}
+
+
+@pytest.mark.parametrize('caso', CASOS.keys())
+def test_boxplot_igual_ao_pandas(caso):
+    comparar(CASOS[caso])
+
+
+def test_boxplot_igual_ao_pandas_aleatorio():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'grupo': rng.choice(['FEMININO', 'MASCULINO', 'INFANTIL'], 20000),
+        'valor': np.round(rng.lognormal(4, 0.6, 20000), 1),
+    })
+
+    comparar(df)
+
+
+def test_amostra_de_outliers():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({'grupo': ['a'] * 20000 + ['b'] * 50,
+                       'valor': np.r_[rng.lognormal(4, 1.0, 20000), rng.normal(10, 1, 50)]})
+    _, outliers_esperados = boxplot_pandas(df, 'grupo')
+    esperados_a = outliers_esperados.loc[outliers_esperados['grupo'] == 'a', 'valor'].to_numpy()
+    assert len(esperados_a) > 100
+
+    _, outliers = transformacoes_grafico_boxplot(df, 'grupo', max_outliers=100)
+    amostra_a = outliers.loc[outliers['grupo'] == 'a', 'valor'].to_numpy()
+
+    # Exatamente max_outliers valores, todos outliers, ordenados e com o menor e o maior
+    assert len(amostra_a) == 100
+    assert np.isin(amostra_a, esperados_a).all()
+    assert (np.diff(amostra_a) >= 0).all()
+    assert amostra_a[0] == esperados_a.min() and amostra_a[-1] == esperados_a.max()
+
+    # Grupos com poucos outliers continuam completos
+    pd.testing.assert_frame_equal(
+        outliers.loc[outliers['grupo'] == 'b'].reset_index(drop=True),
+        outliers_esperados.loc[outliers_esperados['grupo'] == 'b'].reset_index(drop=True),
+        check_dtype=False
+    )
+
+
+def test_quantis_iguais_ao_pandas():
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({
+        'grupo': rng.choice(['a', 'b', 'c', None], 5000),
+        'valor': np.where(rng.random(5000) < 0.05, np.nan, rng.normal(100, 30, 5000).round(1)),
+    })
+
+    obtido = _estatisticas_por_grupo(df, 'grupo', 'valor', (0.25, 0.5, 0.75)).set_index('grupo')
+    esperado = df.groupby('grupo')['valor'].quantile([0.25, 0.5, 0.75]).unstack()
+
+    for q in (0.25, 0.5, 0.75):
+        np.testing.assert_allclose(obtido[f'quantil_{q:g}'], esperado[q], rtol=1e-12)
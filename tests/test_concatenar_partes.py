@@ -0,0 +1,18 @@
+import pandas as pd
+
+from st_renner_libs import _concatenar_partes
+
+
+def test_concatenar_une_categorias_sem_alterar_as_partes():
+    primeira = pd.DataFrame({'tipo_venda': pd.Categorical(['ON', 'ON']), 'valor': [1.0, 2.0]})
+    segunda = pd.DataFrame({'tipo_venda': pd.Categorical(['OFF']), 'valor': [3.0]})
+
+    df = _concatenar_partes([primeira, segunda])
+
+    assert isinstance(df['tipo_venda'].dtype, pd.CategoricalDtype)
+    assert set(df['tipo_venda'].cat.categories) == {'ON', 'OFF'}
+    assert df['tipo_venda'].tolist() == ['ON', 'ON', 'OFF']
+
+    # As partes podem ser dataframes do cache compartilhado e não podem mudar
+    assert primeira['tipo_venda'].cat.categories.tolist() == ['ON']
+    assert segunda['tipo_venda'].cat.categories.tolist() == ['OFF']
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from st_renner_libs import transformacoes_grafico_variacao
+
+
+def variacao_groupby(df_transacao: pd.DataFrame) -> pd.DataFrame:
+    """Versão anterior de transformacoes_grafico_variacao, com groupby e mode por grupo."""
+    def calcular_moda(serie):
+        moda = serie.mode()
+        return moda[0] if len(moda) > 0 else np.nan
+
+    df_variacao = df_transacao.groupby('codigo_item').agg(
+        preco_medio=('valor', 'mean'),
+        preco_min=('valor', 'min'),
+        preco_max=('valor', 'max'),
+        desvio_padrao=('valor', 'std'),
+        qtd_vendida=('valor', 'count'),
+        moda_preco=('valor', calcular_moda)
+    ).reset_index()
+
+    df_variacao['amplitude'] = df_variacao['preco_max'] - df_variacao['preco_min']
+    df_variacao['cv'] = (df_variacao['desvio_padrao'] / df_variacao['preco_medio']) * 100
+    df_variacao['cv'] = df_variacao['cv'].fillna(0)
+    df_variacao['desvio_padrao'] = df_variacao['desvio_padrao'].fillna(0)
+
+    return df_variacao
+
+
+def comparar(obtido: pd.DataFrame, esperado: pd.DataFrame) -> None:
+    # A ordem entre itens com a mesma amplitude não é definida; compara por item
+    obtido = obtido.sort_values('codigo_item').reset_index(drop=True)
+    esperado = esperado.sort_values('codigo_item').reset_index(drop=True)
+    pd.testing.assert_frame_equal(obtido, esperado[obtido.columns], check_dtype=False, rtol=1e-9)
+
+
+CASOS = {
+    'vazio': pd.DataFrame({'codigo_item': pd.Series([], dtype='int64'), 'valor': pd.Series([], dtype='float64')}),
+    'um_grupo': pd.DataFrame({'codigo_item': [7, 7, 7, 7], 'valor': [10.0, 20.0, 20.0, 35.5]}),
+    'um_valor': pd.DataFrame({'codigo_item': [7], 'valor': [10.0]}),
+    'empate_na_moda': pd.DataFrame({'codigo_item': [1, 1, 1, 1, 2, 2], 'valor': [30.0, 10.0, 30.0, 10.0, 5.0, 4.0]}),
+    'com_nan': pd.DataFrame({'codigo_item': [1, 1, 1, 2, 2, 3], 'valor': [np.nan, 9.9, 9.9, np.nan, np.nan, 1.0]}),
+}
+
+
+@pytest.mark.parametrize('caso', CASOS.keys())
+def test_variacao_igual_ao_groupby(caso):
+    df = CASOS[caso]
+    obtido = transformacoes_grafico_variacao(df)
+
+    if df.empty:
+        assert obtido.empty
+        return
+
+    comparar(obtido, variacao_groupby(df))
+
+
+def test_variacao_igual_ao_groupby_aleatorio():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'codigo_item': rng.integers(0, 300, 20000),
+        'valor': rng.choice([9.9, 19.9, 29.9, 49.9, np.nan], 20000),
+    })
+
+    comparar(transformacoes_grafico_variacao(df), variacao_groupby(df))
+
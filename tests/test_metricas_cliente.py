@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from st_renner_libs import process_customer_metrics_fe, transform_sales_dates_fe
+
+# O fillna(inplace=True) de process_customer_metrics_fe avisa sobre o comportamento do pandas 3
+pytestmark = pytest.mark.filterwarnings('ignore::FutureWarning')
+
+
+def metricas_cliente_groupby(df: pd.DataFrame) -> pd.DataFrame:
+    """Versão anterior de process_customer_metrics_fe, com get_dummies e lambdas por cliente."""
+    df = df.copy()
+    df = df.sort_values(by=['id_cliente', 'data_venda'])
+    df['intervalo_compra'] = df.groupby('id_cliente')['data_venda'].diff().dt.days
+    df['intervalo_compra'] = df['intervalo_compra'].fillna(0)
+
+    divisoes_encoded = pd.get_dummies(df['nome_divisao'])
+    divisoes_encoded['id_cliente'] = df['id_cliente']
+    divisoes_por_cliente = divisoes_encoded.groupby('id_cliente').sum().reset_index()
+
+    df_metricas_cliente = df.groupby('id_cliente').agg(
+        qtd_compras=('valor', 'size'),
+        fds=('fds', 'sum'),
+        dia_preferido=('dia_compra', lambda x: x.mode()[0]),
+        compras_ON=('tipo_venda', lambda x: (x == 'ON').sum()),
+        compras_OFF=('tipo_venda', lambda x: (x == 'OFF').sum()),
+        ticket_medio=('valor', 'mean'),
+        total_gasto=('valor', 'sum'),
+        produtos_diferentes=('codigo_item', pd.Series.nunique),
+        intervalo_medio=('intervalo_compra', 'mean')
+    ).reset_index()
+
+    return pd.merge(df_metricas_cliente, divisoes_por_cliente, on='id_cliente', how='left')
+
+
+def transacoes(id_cliente, data_venda, tipo_venda=None, nome_divisao=None, valor=None) -> pd.DataFrame:
+    qtd = len(id_cliente)
+    return transform_sales_dates_fe(pd.DataFrame({
+        'id_cliente': id_cliente,
+        'codigo_item': np.arange(qtd) % 3,
+        'valor': valor if valor is not None else np.linspace(9.9, 99.9, qtd),
+        'tipo_venda': tipo_venda if tipo_venda is not None else ['ON', 'OFF'] * (qtd // 2) + ['ON'] * (qtd % 2),
+        'nome_divisao': nome_divisao if nome_divisao is not None else ['FEMININO'] * qtd,
+        'data_venda': pd.to_datetime(data_venda),
+    }))
+
+
+def comparar(df: pd.DataFrame) -> None:
+    pd.testing.assert_frame_equal(
+        process_customer_metrics_fe(df), metricas_cliente_groupby(df), check_dtype=False, check_names=False
+    )
+
+
+def test_vazio():
+    df = transacoes([], [])
+    obtido = process_customer_metrics_fe(df)
+
+    assert obtido.empty
+    assert list(obtido.columns)[:10] == list(metricas_cliente_groupby(df).columns)[:10]
+
+
+def test_um_cliente():
+    comparar(transacoes([5, 5, 5], ['2024-01-06', '2024-01-07', '2024-01-13']))
+
+
+def test_empate_no_dia_preferido():
+    # Duas compras no sábado (5) e duas na segunda (0): vence o menor dia, como no mode()[0]
+    comparar(transacoes([1, 1, 1, 1, 2, 2], ['2024-01-06', '2024-01-08', '2024-01-13', '2024-01-15',
+                                             '2024-01-09', '2024-01-10']))
+
+
+def test_dia_ausente():
+    # O cliente 1 tem uma compra sem data, que não pode contar para o dia preferido do cliente 2
+    df = transacoes([1, 1, 1, 2, 2], ['2024-01-06', None, None, '2024-01-08', '2024-01-09'])
+    obtido = process_customer_metrics_fe(df)
+
+    assert obtido['dia_preferido'].tolist() == [5, 0]
+    comparar(df)
+
+
+def test_cliente_sem_nenhum_dia():
+    df = transacoes([1, 2, 2], [None, '2024-01-08', '2024-01-09'])
+    obtido = process_customer_metrics_fe(df).set_index('id_cliente')
+
+    assert np.isnan(obtido.loc[1, 'dia_preferido'])
+    assert obtido.loc[2, 'dia_preferido'] == 0
+
+
+def test_aleatorio():
+    rng = np.random.default_rng(0)
+    qtd = 5000
+    datas = pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 700, qtd), unit='D')
+    comparar(transacoes(
+        rng.integers(0, 400, qtd), datas,
+        tipo_venda=rng.choice(['ON', 'OFF'], qtd),
+        nome_divisao=rng.choice(['FEMININO', 'MASCULINO', 'INFANTIL'], qtd),
+        valor=rng.choice([9.9, 19.9, 49.9], qtd),
+    ))
+
+
+def test_divisoes_categoricas():
+    # Como no esquema da tabela: divisão categórica, com uma categoria sem vendas e uma venda sem divisão
+    nome_divisao = pd.Categorical(['FEMININO', 'MASCULINO', None, 'FEMININO', 'FEMININO'],
+                                  categories=['FEMININO', 'INFANTIL', 'MASCULINO'])
+    df = transacoes([1, 1, 1, 2, 3], ['2024-01-06', '2024-01-07', '2024-01-08', '2024-01-09', '2024-01-10'],
+                    nome_divisao=nome_divisao)
+    obtido = process_customer_metrics_fe(df)
+
+    assert list(obtido.columns[-3:]) == ['FEMININO', 'INFANTIL', 'MASCULINO']
+    assert obtido[['FEMININO', 'INFANTIL', 'MASCULINO']].to_numpy().tolist() == [[1, 0, 1], [1, 0, 0], [1, 0, 0]]
+    comparar(df)
+
+
+def test_divisoes_categoricas_aleatorio():
+    rng = np.random.default_rng(1)
+    qtd = 5000
+    datas = pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 700, qtd), unit='D')
+    nome_divisao = pd.Categorical(rng.choice(['FEMININO', 'MASCULINO', 'INFANTIL', None], qtd),
+                                  categories=['CASA', 'FEMININO', 'INFANTIL', 'MASCULINO'])
+    comparar(transacoes(rng.integers(0, 400, qtd), datas, nome_divisao=nome_divisao))
@@ -0,0 +1,107 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from st_renner_libs import (
+    _combinar_estados_precos, _estado_precos_itens, _estatisticas_do_estado, _estatisticas_por_grupo,
+    atualizar_metricas_itens, transformacoes_grafico_variacao,
+)
+
+
+def estatisticas_em_lotes(lotes: list[pd.DataFrame]) -> pd.DataFrame:
+    """Combina os estados de cada lote, como atualizar_metricas_itens faz a cada arquivo novo."""
+    estado, contagens = _estado_precos_itens(lotes[0])
+    for lote in lotes[1:]:
+        estado, contagens = _combinar_estados_precos(estado, contagens, *_estado_precos_itens(lote))
+
+    return _estatisticas_do_estado(estado, contagens)
+
+
+def comparar_com_recalculo(lotes: list[pd.DataFrame]) -> None:
+    obtido = estatisticas_em_lotes(lotes)
+    esperado = _estatisticas_por_grupo(pd.concat(lotes, ignore_index=True), 'codigo_item', 'valor')
+
+    pd.testing.assert_frame_equal(
+        obtido.reset_index(drop=True), esperado[obtido.columns].reset_index(drop=True),
+        check_dtype=False, rtol=1e-9
+    )
+
+
+def transacoes(codigos: list[int], valores: list[float]) -> pd.DataFrame:
+    return pd.DataFrame({'codigo_item': pd.Series(codigos, dtype='int64'),
+                         'valor': pd.Series(valores, dtype='float64')})
+
+
+def test_combinar_com_lote_vazio():
+    comparar_com_recalculo([transacoes([1, 1, 2], [9.9, 19.9, 5.0]), transacoes([], [])])
+    comparar_com_recalculo([transacoes([], []), transacoes([1, 1, 2], [9.9, 19.9, 5.0])])
+
+
+def test_combinar_um_grupo():
+    comparar_com_recalculo([transacoes([7], [10.0]), transacoes([7, 7], [20.0, 20.0]), transacoes([7], [35.5])])
+
+
+def test_combinar_empate_na_moda():
+    # Cada preço aparece duas vezes no total; a moda é o menor, como em Series.mode()[0]
+    comparar_com_recalculo([transacoes([1, 1], [30.0, 10.0]), transacoes([1, 1], [10.0, 30.0])])
+
+
+def test_combinar_com_nan():
+    # O item 2 só tem valores ausentes no primeiro lote e o item 3 só aparece no segundo
+    comparar_com_recalculo([
+        transacoes([1, 1, 2, 2], [np.nan, 9.9, np.nan, np.nan]),
+        transacoes([1, 2, 3], [9.9, 4.0, np.nan]),
+    ])
+
+
+def test_combinar_aleatorio():
+    rng = np.random.default_rng(0)
+    df = transacoes(rng.integers(0, 300, 30000).tolist(),
+                    rng.choice([9.9, 19.9, 29.9, 49.9, np.nan], 30000).tolist())
+
+    comparar_com_recalculo([df.iloc[inicio:inicio + 4500] for inicio in range(0, len(df), 4500)])
+
+
+def gravar_parquet(armazenamento, chave: str, df: pd.DataFrame) -> None:
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    buffer.seek(0)
+    armazenamento.gravar(chave, buffer)
+
+
+def test_nao_regrava_itens_metricas_com_outras_colunas(armazenamento_local):
+    armazenamento_local.gravar('input/transacao.csv', transacoes([1, 1, 2], [9.9, 19.9, 5.0]).to_csv(index=False).encode())
+    antiga = pd.DataFrame({'codigo_item': [1, 2], 'preco_medio': [0.0, 0.0]})
+    gravar_parquet(armazenamento_local, 'output/df_itens_metricas.parquet', antiga)
+
+    with pytest.raises(ValueError):
+        atualizar_metricas_itens()
+
+    with armazenamento_local.abrir('output/df_itens_metricas.parquet') as corpo:
+        pd.testing.assert_frame_equal(pd.read_parquet(io.BytesIO(corpo.read())), antiga)
+    assert armazenamento_local.listar('output/estado_itens/') == []
+
+
+def test_regrava_itens_metricas_com_as_mesmas_colunas(armazenamento_local):
+    df_transacao = transacoes([1, 1, 2], [9.9, 10.9, 5.0])
+    armazenamento_local.gravar('input/transacao.csv', df_transacao.to_csv(index=False).encode())
+    colunas = list(transformacoes_grafico_variacao(df_transacao).columns)
+    gravar_parquet(armazenamento_local, 'output/df_itens_metricas.parquet', pd.DataFrame(columns=colunas))
+
+    atualizar_metricas_itens()
+
+    with armazenamento_local.abrir('output/df_itens_metricas.parquet') as corpo:
+        assert len(pd.read_parquet(io.BytesIO(corpo.read()))) == 2
+
+
+def test_itens_metricas_sem_os_itens_descartados_no_etl(armazenamento_local):
+    # 108799 é descartado pelas heurísticas, 3 tem preço moda abaixo de R$ 1,00 e 4 tem desvio padrão >= 1,5
+    df_transacao = transacoes([1, 1, 108799, 108799, 3, 3, 4, 4], [9.9, 10.9, 9.9, 9.9, 0.5, 0.5, 9.9, 19.9])
+    armazenamento_local.gravar('input/transacao.csv', df_transacao.to_csv(index=False).encode())
+
+    atualizar_metricas_itens()
+
+    with armazenamento_local.abrir('output/itens_metricas.parquet') as corpo:
+        assert pd.read_parquet(io.BytesIO(corpo.read()))['codigo_item'].tolist() == [1]
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import st_renner_libs
+from st_renner_libs import compactar_entradas_parquet, read_csv_files_fe
+
+
+@pytest.fixture
+def transacoes(armazenamento_local):
+    """Transações de janeiro a março de 2024 gravadas como CSV na pasta input."""
+    rng = np.random.default_rng(0)
+    qtd = 3000
+    df = pd.DataFrame({
+        'id_cliente': rng.integers(0, 100, qtd),
+        'codigo_item': rng.integers(0, 50, qtd),
+        'valor': rng.choice([9.9, 19.9, 49.9], qtd),
+        'tipo_venda': rng.choice(['ON', 'OFF'], qtd),
+        'nome_divisao': rng.choice(['FEMININO', 'MASCULINO'], qtd),
+        'data_venda': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 91, qtd), unit='D'),
+    })
+    armazenamento_local.gravar('input/transacao.csv', df.to_csv(index=False).encode())
+
+    return df
+
+
+@pytest.fixture
+def chaves_lidas(monkeypatch):
+    """Registra as chaves dos objetos lidos pelos loaders."""
+    chaves = []
+    ler_arquivo = st_renner_libs._ler_arquivo
+
+    def registrar(file_key, *args, **kwargs):
+        chaves.append(file_key)
+        return ler_arquivo(file_key, *args, **kwargs)
+
+    monkeypatch.setattr(st_renner_libs, '_ler_arquivo', registrar)
+
+    return chaves
+
+
+def test_periodo_le_apenas_as_particoes_do_periodo(transacoes, chaves_lidas):
+    compactar_entradas_parquet()
+    chaves_lidas.clear()
+
+    _, df_transacao = read_csv_files_fe({'transacao': ['codigo_item', 'valor', 'data_venda']},
+                                        periodo=('2024-02-10', '2024-02-20'))
+
+    assert chaves_lidas == ['input/_compactados/transacao/ano=2024/mes=02/transacao.parquet']
+    esperado = transacoes[transacoes['data_venda'].between('2024-02-10', '2024-02-20')]
+    assert len(df_transacao) == len(esperado)
+    assert df_transacao['data_venda'].between('2024-02-10', '2024-02-20').all()
+
+
+def test_periodo_entre_meses(transacoes, chaves_lidas):
+    compactar_entradas_parquet()
+    chaves_lidas.clear()
+
+    _, df_transacao = read_csv_files_fe({'transacao': ['valor', 'data_venda']}, periodo=('2024-01-25', '2024-02-05'))
+
+    assert sorted(chaves_lidas) == [
+        'input/_compactados/transacao/ano=2024/mes=01/transacao.parquet',
+        'input/_compactados/transacao/ano=2024/mes=02/transacao.parquet',
+    ]
+    assert len(df_transacao) == transacoes['data_venda'].between('2024-01-25', '2024-02-05').sum()
+
+
+def test_periodo_sem_compactacao_filtra_o_csv(transacoes, chaves_lidas):
+    _, df_transacao = read_csv_files_fe({'transacao': ['valor', 'data_venda']}, periodo=('2024-03-01', '2024-03-31'))
+
+    assert chaves_lidas == ['input/transacao.csv']
+    assert len(df_transacao) == transacoes['data_venda'].between('2024-03-01', '2024-03-31').sum()
+
+
+def test_sem_periodo_le_todo_o_historico(transacoes, chaves_lidas):
+    compactar_entradas_parquet()
+    chaves_lidas.clear()
+
+    _, df_transacao = read_csv_files_fe({'transacao': ['valor', 'data_venda']})
+
+    assert len(chaves_lidas) == 3
+    assert len(df_transacao) == len(transacoes)
+
+
+def _pagina_transacoes():
+    """Página mínima que carrega dois anos de transações."""
+    from st_renner_libs import read_csv_files_fe
+
+    read_csv_files_fe({'transacao': ['valor', 'data_venda']}, periodo=('2022-01-01', '2023-12-31'))
+
+
+def test_janela_longa_fica_em_cache(armazenamento_local, chaves_lidas):
+    # Dois anos de partições mensais: mais partes do que entradas no cache de _ler_objeto
+    datas = pd.date_range('2022-01-01', '2023-12-31', freq='D')
+    df = pd.DataFrame({
+        'id_cliente': np.arange(len(datas)) % 100,
+        'codigo_item': np.arange(len(datas)) % 50,
+        'valor': 19.9,
+        'tipo_venda': 'ON',
+        'nome_divisao': 'FEMININO',
+        'data_venda': datas,
+    })
+    armazenamento_local.gravar('input/transacao.csv', df.to_csv(index=False).encode())
+    compactar_entradas_parquet()
+    chaves_lidas.clear()
+    st_renner_libs._ler_tabela.clear()
+
+    # O cache do Streamlit só guarda resultados dentro da execução de uma página
+    pagina = AppTest.from_function(_pagina_transacoes, default_timeout=30)
+    pagina.run()
+    assert not pagina.exception
+    assert len(chaves_lidas) == 24
+
+    chaves_lidas.clear()
+    pagina.run()
+    assert not pagina.exception
+    assert chaves_lidas == []